@@ -0,0 +1,1425 @@
+# benchmark.py: Medição de desempenho do solucionador de Takuzu
+#
+# Uso (a partir da pasta misc):
+#   python benchmark.py backend [../tests]
+#   python benchmark.py trail [../tests]
+#   python benchmark.py propagate [../tests]
+#   python benchmark.py unique [../tests]
+#   python benchmark.py rules [--sizes 4 50] [--samples 5]
+#   python benchmark.py patterns [../tests] [--samples 5]
+#   python benchmark.py domains [../tests]
+#   python benchmark.py probe [../tests] [--budgets 0 8 32] [--keep 0.5]
+#   python benchmark.py branching [../tests] [--keep 0.5]
+#   python benchmark.py zobrist [../tests] [--keep 0.5]
+#   python benchmark.py tt [../tests] [--sizes 256 65536] [--keep 0]
+#   python benchmark.py queue [../tests] [--keep 0.5]
+#   python benchmark.py lazy [../tests] [--keep 0]
+#   python benchmark.py delta [../tests] [--every 4 16] [--keep 0.5]
+#   python benchmark.py pack [../tests] [--keep 0.5]
+#   python benchmark.py spill [../tests] [--capacity 64 16] [--keep 0.5]
+#   python benchmark.py slots [../tests]
+#   python benchmark.py arena [../tests] [--keep 0]
+#   python benchmark.py batch [../tests] [--repeat 1 10]
+#   python benchmark.py pool [../tests] [--workers 1 2 4] [--repeat 20] [--chunk 8]
+#   python benchmark.py parallel [../tests] [--workers 1 2 4] [--keep 0.5]
+#   python benchmark.py sharedtt [../tests] [--workers 4] [--size 65536] [--keep 0.5]
+#   python benchmark.py portfolio [../tests] [--keep 0.5] [--limit 60]
+
+import argparse
+import contextlib
+import functools
+import gc
+import os
+import random
+import subprocess
+import sys
+import time
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Solucionador, executado num processo à parte pelo benchmark batch
+TAKUZU = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "takuzu.py")
+
+import patterns
+from search import InstrumentedProblem, Node, best_first_graph_search
+from utils import (
+    IndexedPriorityQueue,
+    PriorityQueue,
+    SharedTranspositionTable,
+    SpillingPriorityQueue,
+    TranspositionTable,
+    memoize,
+)
+from takuzu import (
+    BACKENDS,
+    BRANCHING,
+    PORTFOLIO,
+    SEARCHES,
+    Board,
+    Takuzu,
+    TakuzuDeltaState,
+    TakuzuDomains,
+    TakuzuState,
+    propagate,
+    propagate_vectorized,
+    solve,
+)
+
+TESTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tests")
+
+
+def load_tests(path):
+    """Devolve uma lista de pares (nome, caminho) para cada ficheiro .in da pasta."""
+    names = sorted(f for f in os.listdir(path) if f.endswith(".in"))
+    return [(n[:-3], os.path.join(path, n)) for n in names]
+
+
+def expected_output(path):
+    with open(path[:-3] + ".out") as f:
+        return f.read().strip()
+
+
+def run(path, board_class=Board, problem_class=Takuzu, search=solve):
+    """Lê e resolve o tabuleiro do ficheiro e devolve o problema instrumentado,
+    o nó objetivo e o tempo de execução em segundos."""
+    with open(path) as f:
+        board = board_class.parse_instance(f)
+    return run_board(board, problem_class, search)
+
+
+def run_board(board, problem_class=Takuzu, search=solve):
+    """Como run, mas para um tabuleiro já construído (que é copiado, porque a
+    procura com desfazer altera o tabuleiro inicial)."""
+    problem = InstrumentedProblem(problem_class(board.copy()))
+    start = time.perf_counter()
+    goal_node = search(problem)
+    return problem, goal_node, time.perf_counter() - start
+
+
+def run_traced(path, board_class=Board, problem_class=Takuzu, search=solve):
+    """Como run, mas devolve também o pico de memória alocada (em bytes) durante
+    a procura. O tempo é medido numa execução separada, sem o tracemalloc."""
+    tracemalloc.start()
+    run(path, board_class, problem_class, search)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return run(path, board_class, problem_class, search) + (peak,)
+
+
+def run_board_traced(board, problem_class=Takuzu, search=solve):
+    """Como run_traced, mas para um tabuleiro já construído."""
+    tracemalloc.start()
+    run_board(board, problem_class, search)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return run_board(board, problem_class, search) + (peak,)
+
+
+@contextlib.contextmanager
+def identity_states():
+    """Faz com que, temporariamente, os estados sejam comparados por identidade
+    (como antes de terem hash de Zobrist), para medir a diferença."""
+    eq, hash_ = TakuzuState.__eq__, TakuzuState.__hash__
+    TakuzuState.__eq__, TakuzuState.__hash__ = object.__eq__, object.__hash__
+    try:
+        yield
+    finally:
+        TakuzuState.__eq__, TakuzuState.__hash__ = eq, hash_
+
+
+def random_board(dim, fill, rng):
+    """Gera um tabuleiro parcialmente preenchido que não viola nenhuma regra:
+    preenche células ao acaso e propaga até atingir a fração 'fill' de células
+    preenchidas, e depois esvazia ao acaso um terço delas, para que as regras
+    tenham jogadas a encontrar. Não garante que o tabuleiro tenha solução."""
+    grid = [[2] * dim for i in range(dim)]
+    cells = [(i, j) for i in range(dim) for j in range(dim)]
+    rng.shuffle(cells)
+    for i, j in cells:
+        if sum(row.count(2) for row in grid) <= (1 - fill) * dim**2:
+            break
+        if grid[i][j] != 2:
+            continue
+        for v in rng.sample((0, 1), 2):
+            attempt = [row.copy() for row in grid]
+            attempt[i][j] = v
+            if propagate(attempt, dim) is not None:
+                grid = attempt
+                break
+    for i, j in cells:
+        if rng.random() < 1 / 3:
+            grid[i][j] = 2
+    return Board.from_matrix(grid)
+
+
+def sparse_board(path, keep, rng):
+    """Devolve a solução esperada do teste com apenas a fração 'keep' das células
+    preenchidas, escolhidas ao acaso. O tabuleiro tem sempre solução, mas pode
+    ter várias."""
+    with open(path[:-3] + ".out") as f:
+        grid = [[int(n) for n in line.split()] for line in f if line.strip()]
+    for row in grid:
+        for j in range(len(row)):
+            if rng.random() >= keep:
+                row[j] = 2
+    return Board.from_matrix(grid)
+
+
+def timed(f, *args, repeat=5):
+    """Devolve o resultado de f(*args) e o menor tempo de 'repeat' execuções."""
+    best = None
+    for r in range(repeat):
+        start = time.perf_counter()
+        res = f(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return res, best
+
+
+@contextlib.contextmanager
+def gc_pauses():
+    """Mede as recolhas do coletor de lixo feitas dentro do bloco. Devolve uma
+    lista [número de recolhas, tempo total em segundos], atualizada no fim."""
+    stats = [0, 0.0]
+    start = []
+
+    def callback(phase, info):
+        if phase == "start":
+            start.append(time.perf_counter())
+        else:
+            stats[0] += 1
+            stats[1] += time.perf_counter() - start.pop()
+
+    gc.callbacks.append(callback)
+    try:
+        yield stats
+    finally:
+        gc.callbacks.remove(callback)
+
+
+@contextlib.contextmanager
+def counting_copies():
+    """Conta as cópias de tabuleiros (Board.copy) feitas dentro do bloco."""
+    count = [0]
+    copy = Board.copy
+
+    def counted(board):
+        count[0] += 1
+        return copy(board)
+
+    Board.copy = counted
+    try:
+        yield count
+    finally:
+        Board.copy = copy
+
+
+def print_table(header, rows):
+    """Imprime uma tabela em Markdown, no mesmo formato do relatório."""
+    print("| " + " | ".join(header) + " |")
+    print("| " + " | ".join("-" * len(h) for h in header) + " |")
+    for row in rows:
+        print("| " + " | ".join(str(c) for c in row) + " |")
+
+
+def bench_backend(args):
+    """Compara o custo por nó das representações do tabuleiro."""
+    rows = []
+    for name, path in load_tests(args.tests):
+        for backend, board_class in BACKENDS.items():
+            problem, goal_node, elapsed = run(path, board_class)
+            ok = str(goal_node.state.board) == expected_output(path)
+            nodes = problem.goal_tests
+            rows.append(
+                [
+                    name,
+                    backend,
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    nodes,
+                    "{:.1f} µs".format(elapsed / nodes * 1e6),
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(["Teste", "Tabuleiro", "Tempo", "Nós", "Tempo por nó", "Correto"], rows)
+
+
+def bench_trail(args):
+    """Compara a DFS que copia o tabuleiro em cada nó com a DFS com desfazer."""
+    rows = []
+    for name, path in load_tests(args.tests):
+        for search in ("dfs", "trail"):
+            problem, goal_node, elapsed, peak = run_traced(
+                path, search=SEARCHES[search]
+            )
+            ok = str(goal_node.state.board) == expected_output(path)
+            nodes = problem.goal_tests
+            rows.append(
+                [
+                    name,
+                    search,
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    nodes,
+                    "{:.1f} µs".format(elapsed / nodes * 1e6),
+                    "{:.1f} KiB".format(peak / 1024),
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Procura",
+            "Tempo",
+            "Nós",
+            "Tempo por nó",
+            "Pico de memória",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_propagate(args):
+    """Compara uma jogada forçada por ação com a propagação até ao ponto fixo."""
+    rows = []
+    for name, path in load_tests(args.tests):
+        for propagate in (False, True):
+            problem, goal_node, elapsed = run(
+                path, problem_class=functools.partial(Takuzu, propagate=propagate)
+            )
+            ok = str(goal_node.state.board) == expected_output(path)
+            rows.append(
+                [
+                    name,
+                    "sim" if propagate else "não",
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    problem.states,
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        ["Teste", "Propagação", "Tempo", "Nós expandidos", "Nós gerados", "Correto"],
+        rows,
+    )
+
+
+def bench_unique(args):
+    """Mede o efeito da regra das filas distintas durante a propagação."""
+    rows = []
+    for name, path in load_tests(args.tests):
+        for unique in (False, True):
+            problem, goal_node, elapsed = run(
+                path, problem_class=functools.partial(Takuzu, unique=unique)
+            )
+            ok = str(goal_node.state.board) == expected_output(path)
+            stats = problem.stats
+            rows.append(
+                [
+                    name,
+                    "sim" if unique else "não",
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    stats["propagated"],
+                    stats["pruned"],
+                    stats["unique_forced"],
+                    stats["unique_pruned"],
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Filas distintas",
+            "Tempo",
+            "Nós expandidos",
+            "Jogadas propagadas",
+            "Cortes",
+            "Jogadas (distintas)",
+            "Cortes (distintas)",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_rules(args):
+    """Compara a avaliação das regras célula a célula com a versão vetorizada,
+    tanto na propagação completa como numa única jogada, para tabuleiros
+    gerados aleatoriamente de várias dimensões."""
+    rng = random.Random(args.seed)
+    rows = []
+    for dim in range(args.sizes[0], args.sizes[1] + 1, 2):
+        t = {"propagate": [0, 0], "actions": [0, 0]}
+        same = True
+        for n in range(args.samples):
+            board = random_board(dim, 0.5, rng)
+            state = TakuzuState(board, None)
+            loop, t_loop = timed(lambda: propagate(board.to_matrix(), dim))
+            vect, t_vect = timed(lambda: propagate_vectorized(board.to_array()))
+            same &= (loop is None) == (vect is None) and set(loop or []) == set(
+                vect or []
+            )
+            t["propagate"][0] += t_loop
+            t["propagate"][1] += t_vect
+            for k, rules in enumerate(("loop", "vectorized")):
+                problem = Takuzu(board, propagate=False, rules=rules)
+                actions, elapsed = timed(problem.actions, state)
+                t["actions"][k] += elapsed
+                if k == 0:
+                    expected = actions
+                same &= actions == expected
+        for mode in ("propagate", "actions"):
+            loop, vect = t[mode]
+            rows.append(
+                [
+                    dim,
+                    mode,
+                    "{:.1f} µs".format(loop / args.samples * 1e6),
+                    "{:.1f} µs".format(vect / args.samples * 1e6),
+                    "{:.1f}x".format(loop / vect),
+                    "sim" if same else "NÃO",
+                ]
+            )
+    print_table(
+        ["Dimensão", "Avaliação", "Ciclos", "Vetorizada", "Aceleração", "Iguais"],
+        rows,
+    )
+
+
+def bench_patterns(args):
+    """Mede a construção e leitura das tabelas de filas válidas e o efeito do
+    índice de padrões na propagação, e verifica que, com o índice, a propagação
+    célula a célula e a vetorizada chegam ao mesmo tabuleiro em versões
+    esparsas das soluções dos testes."""
+    rows = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for dim in sorted({int(name[2:4]) for name, path in load_tests(args.tests)}):
+            build = timed(patterns.load_lines, dim, cache_dir, repeat=1)[1]
+            lines, load = timed(patterns.load_lines, dim, cache_dir)
+            rows.append(
+                [
+                    dim,
+                    len(lines),
+                    "{:.1f} KiB".format(lines.nbytes / 1024),
+                    "{:.2f} ms".format(build * 1e3),
+                    "{:.2f} ms".format(load * 1e3),
+                ]
+            )
+    print_table(["Dimensão", "Filas válidas", "Tamanho", "Construção", "Leitura"], rows)
+    print()
+    rows = []
+    for name, path in load_tests(args.tests):
+        for use in (False, True):
+            problem, goal_node, elapsed = run(
+                path, problem_class=functools.partial(Takuzu, patterns=use)
+            )
+            ok = str(goal_node.state.board) == expected_output(path)
+            stats = problem.stats
+            rows.append(
+                [
+                    name,
+                    "sim" if use else "não",
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    stats["propagated"],
+                    stats["pattern_forced"],
+                    stats["pattern_pruned"],
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Padrões",
+            "Tempo",
+            "Nós expandidos",
+            "Jogadas propagadas",
+            "Jogadas (padrões)",
+            "Cortes (padrões)",
+            "Correto",
+        ],
+        rows,
+    )
+    print()
+    rng = random.Random(args.seed)
+    rows = []
+    for name, path in load_tests(args.tests):
+        cases = contradictions = 0
+        same = True
+        for keep in (0.2, 0.35, 0.5):
+            for n in range(args.samples):
+                board = sparse_board(path, keep, rng)
+                index = patterns.get_index(board.dim)
+                for unique in (True, False):
+                    grid = board.to_matrix()
+                    loop = propagate(grid, board.dim, unique, None, index)
+                    a = board.to_array()
+                    vect = propagate_vectorized(a, unique, None, index)
+                    cases += 1
+                    contradictions += loop is None
+                    same &= (loop is None) == (vect is None)
+                    if loop is not None:
+                        # O resultado tem de ser um ponto fixo
+                        same &= grid == a.tolist()
+                        same &= not propagate(grid, board.dim, unique, None, index)
+        rows.append([name, cases, contradictions, "sim" if same else "NÃO"])
+    print_table(["Teste", "Tabuleiros", "Contradições", "Iguais"], rows)
+
+
+def bench_domains(args):
+    """Compara a propagação célula a célula com a filtragem dos domínios de
+    filas possíveis de cada linha e coluna."""
+    rows = []
+    for name, path in load_tests(args.tests):
+        for problem_class in (Takuzu, TakuzuDomains):
+            problem, goal_node, elapsed = run(path, problem_class=problem_class)
+            ok = str(goal_node.state.board) == expected_output(path)
+            rows.append(
+                [
+                    name,
+                    problem_class.__name__,
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    problem.states,
+                    goal_node.depth,
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Problema",
+            "Tempo",
+            "Nós expandidos",
+            "Nós gerados",
+            "Profundidade",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def test_boards(args):
+    """Devolve uma lista de triplos (nome, tabuleiro, solução esperada) com os
+    testes e, se 'args.keep' não for 0, versões esparsas das suas soluções (sem
+    solução esperada, já que podem ter várias)."""
+    rng = random.Random(args.seed)
+    boards = []
+    for name, path in load_tests(args.tests):
+        with open(path) as f:
+            boards.append((name, Board.parse_instance(f), expected_output(path)))
+        if args.keep:
+            boards.append(
+                (
+                    "{} ({:.0%})".format(name, args.keep),
+                    sparse_board(path, args.keep, rng),
+                    None,
+                )
+            )
+    return boards
+
+
+def solved(problem, goal_node, expected):
+    """Verifica a solução encontrada, comparando-a com a esperada, se houver."""
+    if expected is None:
+        return goal_node is not None and problem.goal_test(goal_node.state)
+    return str(goal_node.state.board) == expected
+
+
+def bench_probe(args):
+    """Mede o efeito da sondagem antes de ramificar, com vários orçamentos, nos
+    testes e em versões esparsas das suas soluções."""
+    rows = []
+    for name, board, expected in test_boards(args):
+        for budget in args.budgets:
+            problem, goal_node, elapsed = run_board(
+                board, functools.partial(Takuzu, probe=budget)
+            )
+            ok = solved(problem, goal_node, expected)
+            stats = problem.stats
+            rows.append(
+                [
+                    name,
+                    budget,
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    stats["probes"],
+                    stats["probe_forced"],
+                    stats["probe_pruned"],
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Orçamento",
+            "Tempo",
+            "Nós expandidos",
+            "Sondagens",
+            "Ramos eliminados",
+            "Cortes",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_branching(args):
+    """Compara as políticas de escolha da célula onde ramificar, nos testes e
+    em versões esparsas das suas soluções."""
+    rows = []
+    for name, board, expected in test_boards(args):
+        for policy in BRANCHING:
+            problem, goal_node, elapsed = run_board(
+                board, functools.partial(Takuzu, branching=policy)
+            )
+            ok = solved(problem, goal_node, expected)
+            rows.append(
+                [
+                    name,
+                    policy,
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    problem.states,
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        ["Teste", "Ramificação", "Tempo", "Nós expandidos", "Nós gerados", "Correto"],
+        rows,
+    )
+
+
+def bench_zobrist(args):
+    """Compara a procura gananciosa (usada nos tabuleiros esparsos) com estados
+    comparados por identidade e pelo conteúdo do tabuleiro (hash de Zobrist)."""
+    rows = []
+    for name, board, expected in test_boards(args):
+        for mode in ("identidade", "conteúdo"):
+            with (
+                identity_states() if mode == "identidade" else contextlib.nullcontext()
+            ):
+                problem, goal_node, elapsed, peak = run_board_traced(
+                    board, search=SEARCHES["greedy"]
+                )
+            ok = solved(problem, goal_node, expected)
+            rows.append(
+                [
+                    name,
+                    mode,
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    problem.states,
+                    "{:.1f} KiB".format(peak / 1024),
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Igualdade",
+            "Tempo",
+            "Nós expandidos",
+            "Nós gerados",
+            "Pico de memória",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_tt(args):
+    """Mede a tabela de transposição dos estados sem solução na procura DFS,
+    com vários tamanhos e as duas políticas de substituição."""
+    rows = []
+    configs = [(0, None)] + [(n, p) for n in args.sizes for p in ("lru", "depth")]
+    for name, board, expected in test_boards(args):
+        for size, policy in configs:
+            table = TranspositionTable(size, policy) if size else None
+            problem, goal_node, elapsed = run_board(
+                board, search=functools.partial(SEARCHES["dfs"], table=table)
+            )
+            ok = solved(problem, goal_node, expected)
+            counters = (
+                [table.hits, table.misses, table.stores, table.evictions, len(table)]
+                if table
+                else ["-"] * 5
+            )
+            rows.append(
+                [
+                    name,
+                    "{} ({})".format(size, policy) if size else "sem tabela",
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                ]
+                + counters
+                + ["sim" if ok else "NÃO"]
+            )
+    print_table(
+        [
+            "Teste",
+            "Tabela",
+            "Tempo",
+            "Nós expandidos",
+            "Acertos",
+            "Falhas",
+            "Guardados",
+            "Substituídos",
+            "Ocupação",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_queue(args):
+    """Compara a fila de prioridade original (pesquisa linear na fronteira) com
+    a fila indexada: primeiro só as operações feitas pela procura gananciosa
+    (inserção, teste de pertença e remoção) sobre fronteiras de vários tamanhos,
+    depois a própria procura."""
+    rng = random.Random(args.seed)
+    rows = []
+    for n in args.frontier:
+        items = list(range(n))
+        values = [rng.random() for i in items]
+        times = []
+        for queue in (PriorityQueue, IndexedPriorityQueue):
+            start = time.perf_counter()
+            frontier = queue("min", lambda i: values[i])
+            for i in items:
+                if i not in frontier:
+                    frontier.append(i)
+            while frontier:
+                frontier.pop()
+            times.append(time.perf_counter() - start)
+        rows.append(
+            [n]
+            + ["{:.1f} ms".format(t * 1e3) for t in times]
+            + ["{:.1f}x".format(times[0] / times[1])]
+        )
+    print_table(
+        ["Fronteira", "PriorityQueue", "IndexedPriorityQueue", "Aceleração"], rows
+    )
+    print()
+    rows = []
+    for name, board, expected in test_boards(args):
+        for queue in (PriorityQueue, IndexedPriorityQueue):
+            search = lambda problem: best_first_graph_search(
+                problem, memoize(problem.h, "h"), queue=queue
+            )
+            problem, goal_node, elapsed = run_board(board, search=search)
+            ok = solved(problem, goal_node, expected)
+            nodes = problem.goal_tests
+            rows.append(
+                [
+                    name,
+                    queue.__name__,
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    nodes,
+                    problem.states,
+                    "{:.1f} µs".format(elapsed / nodes * 1e6),
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Fila",
+            "Tempo",
+            "Nós expandidos",
+            "Nós gerados",
+            "Tempo por nó",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_lazy(args):
+    """Compara a DFS que gera todos os filhos de cada nó com a DFS que só os gera
+    quando os explora (e com a DFS com desfazer): cópias do tabuleiro e pico de
+    memória."""
+    rows = []
+    for name, board, expected in test_boards(args):
+        for search in ("dfs", "lazy", "trail"):
+            problem, goal_node, elapsed, peak = run_board_traced(
+                board, search=SEARCHES[search]
+            )
+            ok = solved(problem, goal_node, expected)
+            rows.append(
+                [
+                    name,
+                    search,
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    problem.states,
+                    "{:.1f} KiB".format(peak / 1024),
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Procura",
+            "Tempo",
+            "Nós expandidos",
+            "Tabuleiros gerados",
+            "Pico de memória",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_delta(args):
+    """Mede a procura gananciosa com estados que guardam o tabuleiro completo e
+    com estados que só o guardam a cada k níveis (TakuzuDeltaState): pico de
+    memória e tempo de reconstrução do tabuleiro de um estado."""
+    rows = []
+    for name, board, expected in test_boards(args):
+        for every in (0,) + tuple(args.every):
+            problem_class = functools.partial(Takuzu, snapshot=every)
+            problem, goal_node, elapsed, peak = run_board_traced(
+                board, problem_class, SEARCHES["greedy"]
+            )
+            ok = solved(problem, goal_node, expected)
+            # Tempo de obter o tabuleiro de cada estado do caminho, sem cache
+            path = [node.state for node in goal_node.path()]
+            TakuzuDeltaState.cache.clear()
+            start = time.perf_counter()
+            for state in path:
+                TakuzuDeltaState.cache.clear()
+                state.board
+            rebuild = (time.perf_counter() - start) / len(path)
+            rows.append(
+                [
+                    name,
+                    every or "-",
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    "{:.1f} KiB".format(peak / 1024),
+                    "{:.1f} µs".format(rebuild * 1e6),
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Tabuleiro a cada",
+            "Tempo",
+            "Nós expandidos",
+            "Pico de memória",
+            "Obter tabuleiro",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def allocated(f, repeat=100):
+    """Devolve a memória alocada (em bytes) por cada resultado de f(), medida
+    mantendo 'repeat' resultados vivos."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [f() for r in range(repeat)]
+    size = (tracemalloc.get_traced_memory()[0] - before) / repeat
+    tracemalloc.stop()
+    return size
+
+
+def bench_pack(args):
+    """Mede a memória de um tabuleiro guardado como objeto e codificado em bytes,
+    e a procura gananciosa com e sem a fronteira codificada."""
+    rows = []
+    for name, board, expected in test_boards(args):
+        if expected is None:
+            continue
+        data = board.pack()
+        unpack = timed(Board.unpack, data, repeat=20)[1]
+        rows.append(
+            [
+                name,
+                "{:.0f} B".format(allocated(board.copy)),
+                "{:.0f} B".format(allocated(lambda: bytes(board.pack()))),
+                "{:.1f} µs".format(timed(board.pack, repeat=20)[1] * 1e6),
+                "{:.1f} µs".format(unpack * 1e6),
+            ]
+        )
+    print_table(["Teste", "Tabuleiro", "Codificado", "Codificar", "Descodificar"], rows)
+    print()
+    rows = []
+    for name, board, expected in test_boards(args):
+        for pack in (False, True):
+            problem, goal_node, elapsed, peak = run_board_traced(
+                board,
+                search=lambda problem: SEARCHES["greedy"](problem, pack=pack),
+            )
+            ok = solved(problem, goal_node, expected)
+            rows.append(
+                [
+                    name,
+                    "sim" if pack else "não",
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    problem.states,
+                    "{:.1f} KiB".format(peak / 1024),
+                    "{:.0f} B".format(peak / (problem.states + 1)),
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Codificada",
+            "Tempo",
+            "Nós expandidos",
+            "Nós gerados",
+            "Pico de memória",
+            "Memória por nó",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_spill(args):
+    """Compara a procura gananciosa (com a fronteira codificada) com a fronteira
+    toda em memória e limitada a cada capacidade, escrevendo o resto em disco."""
+    rows = []
+    for name, board, expected in test_boards(args):
+        for capacity in [0] + args.capacity:
+            queues = []
+
+            def queue(order, f):
+                if capacity:
+                    q = SpillingPriorityQueue(order, f, capacity, shared=(Node,))
+                else:
+                    q = IndexedPriorityQueue(order, f)
+                queues.append(q)
+                return q
+
+            problem, goal_node, elapsed, peak = run_board_traced(
+                board,
+                search=lambda problem: SEARCHES["greedy"](problem, None, True, queue),
+            )
+            ok = solved(problem, goal_node, expected)
+            q = queues[-1]
+            rows.append(
+                [
+                    name,
+                    capacity or "-",
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests,
+                    "{:.1f} KiB".format(peak / 1024),
+                    getattr(q, "spills", 0),
+                    getattr(q, "spilled", 0),
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Capacidade",
+            "Tempo",
+            "Nós expandidos",
+            "Pico de memória",
+            "Ficheiros",
+            "Nós escritos",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_slots(args):
+    """Mede a memória de um nó de procura (nó, estado e tabuleiro) e a memória
+    por nó gerado das procuras DFS e gananciosa em cada teste."""
+    rows = []
+    for name, path in load_tests(args.tests):
+        with open(path) as f:
+            board = Board.parse_instance(f)
+        rows.append(
+            [
+                name,
+                "{:.0f} B".format(allocated(board.copy)),
+                "{:.0f} B".format(
+                    allocated(lambda: Node(TakuzuState(board.copy(), None)))
+                ),
+            ]
+        )
+    print_table(["Teste", "Tabuleiro", "Nó com estado e tabuleiro"], rows)
+    print()
+    rows = []
+    for name, path in load_tests(args.tests):
+        for search in ("dfs", "greedy"):
+            problem, goal_node, elapsed, peak = run_traced(
+                path, search=SEARCHES[search]
+            )
+            ok = str(goal_node.state.board) == expected_output(path)
+            rows.append(
+                [
+                    name,
+                    search,
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.states,
+                    "{:.1f} KiB".format(peak / 1024),
+                    "{:.0f} B".format(peak / (problem.states + 1)),
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Teste",
+            "Procura",
+            "Tempo",
+            "Nós gerados",
+            "Pico de memória",
+            "Memória por nó",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_arena(args):
+    """Compara as procuras DFS e gananciosa (com a fronteira codificada) com os
+    tabuleiros alocados à parte e numa arena: cópias de tabuleiros, tabuleiros
+    alocados (na arena, as posições nunca antes usadas), recolhas do coletor de
+    lixo e o tempo gasto nelas."""
+    searches = {
+        "dfs": SEARCHES["dfs"],
+        "greedy": lambda problem: SEARCHES["greedy"](problem, pack=True),
+    }
+    rows = []
+    for name, board, expected in test_boards(args):
+        for search, f in searches.items():
+            for arena in (False, True):
+                problem_class = functools.partial(Takuzu, arena=arena)
+                with counting_copies() as copies, gc_pauses() as pauses:
+                    problem, goal_node, elapsed = run_board(board, problem_class, f)
+                ok = solved(problem, goal_node, expected)
+                pool = problem.arena
+                rows.append(
+                    [
+                        name,
+                        search,
+                        "sim" if arena else "não",
+                        "{:.1f} ms".format(elapsed * 1e3),
+                        problem.goal_tests,
+                        copies[0],
+                        pool.used if arena else copies[0],
+                        pool.peak if arena else "-",
+                        pauses[0],
+                        "{:.2f} ms".format(pauses[1] * 1e3),
+                        "sim" if ok else "NÃO",
+                    ]
+                )
+    print_table(
+        [
+            "Teste",
+            "Procura",
+            "Arena",
+            "Tempo",
+            "Nós expandidos",
+            "Cópias",
+            "Tabuleiros alocados",
+            "Máximo em uso",
+            "Recolhas",
+            "Pausa do coletor",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_batch(args):
+    """Compara resolver cada teste num processo novo com resolver todos num só
+    processo (takuzu.py --batch), com os testes repetidos 'repeat' vezes."""
+    tests = load_tests(args.tests)
+    inputs = []
+    expected = []
+    for name, path in tests:
+        with open(path) as f:
+            inputs.append(f.read())
+        expected.append(expected_output(path))
+    rows = []
+    for repeat in args.repeat:
+        n = len(tests) * repeat
+        start = time.perf_counter()
+        outputs = []
+        for text in inputs * repeat:
+            res = subprocess.run(
+                [sys.executable, TAKUZU], input=text, capture_output=True, text=True
+            )
+            outputs.append(res.stdout.strip())
+        single = time.perf_counter() - start
+        ok = outputs == expected * repeat
+        start = time.perf_counter()
+        res = subprocess.run(
+            [sys.executable, TAKUZU, "--batch"],
+            input="".join(inputs * repeat),
+            capture_output=True,
+            text=True,
+        )
+        batch = time.perf_counter() - start
+        ok = ok and res.stdout.strip() == "\n".join(expected * repeat)
+        for mode, elapsed in (("um processo por teste", single), ("--batch", batch)):
+            rows.append(
+                [
+                    n,
+                    mode,
+                    "{:.2f} s".format(elapsed),
+                    "{:.1f} ms".format(elapsed / n * 1e3),
+                    "{:.1f}".format(n / elapsed),
+                    "sim" if ok else "NÃO",
+                ]
+            )
+    print_table(
+        [
+            "Tabuleiros",
+            "Modo",
+            "Tempo",
+            "Tempo por tabuleiro",
+            "Tabuleiros por segundo",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_pool(args):
+    """Mede o débito de takuzu.py --batch com vários números de processos, com
+    os testes repetidos 'repeat' vezes."""
+    tests = load_tests(args.tests)
+    inputs = []
+    expected = []
+    for name, path in tests:
+        with open(path) as f:
+            inputs.append(f.read())
+        expected.append(expected_output(path))
+    text = "".join(inputs * args.repeat)
+    n = len(tests) * args.repeat
+    rows = []
+    base = None
+    for workers in args.workers:
+        start = time.perf_counter()
+        res = subprocess.run(
+            [sys.executable, TAKUZU, "--batch"]
+            + ["--workers", str(workers), "--chunk", str(args.chunk)],
+            input=text,
+            capture_output=True,
+            text=True,
+        )
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        ok = res.stdout.strip() == "\n".join(expected * args.repeat)
+        rows.append(
+            [
+                workers,
+                "{:.2f} s".format(elapsed),
+                "{:.1f}".format(n / elapsed),
+                "{:.2f}x".format(base / elapsed),
+                "sim" if ok else "NÃO",
+            ]
+        )
+    print("{} tabuleiros, {} processadores".format(n, os.cpu_count()))
+    print()
+    print_table(
+        ["Processos", "Tempo", "Tabuleiros por segundo", "Aceleração", "Correto"],
+        rows,
+    )
+
+
+def bench_parallel(args):
+    """Compara a procura DFS num só processo com a DFS paralela com vários
+    processos, nos testes e em versões esparsas das suas soluções."""
+    rows = []
+    for name, board, expected in test_boards(args):
+        problem, goal_node, base = run_board(board, search=SEARCHES["dfs"])
+        rows.append(
+            [
+                name,
+                "dfs",
+                "{:.1f} ms".format(base * 1e3),
+                "1.00x",
+                problem.goal_tests,
+                "-",
+                "-",
+                "sim" if solved(problem, goal_node, expected) else "NÃO",
+            ]
+        )
+        for workers in args.workers:
+            stats = {}
+            problem, goal_node, elapsed = run_board(
+                board,
+                search=functools.partial(
+                    SEARCHES["parallel"], workers=workers, stats=stats
+                ),
+            )
+            rows.append(
+                [
+                    name,
+                    "parallel ({})".format(workers),
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    "{:.2f}x".format(base / elapsed),
+                    problem.goal_tests + stats["nodes"],
+                    stats["tasks"],
+                    stats["donated"],
+                    "sim" if solved(problem, goal_node, expected) else "NÃO",
+                ]
+            )
+    print("{} processadores".format(os.cpu_count()))
+    print()
+    print_table(
+        [
+            "Teste",
+            "Procura",
+            "Tempo",
+            "Aceleração",
+            "Nós expandidos",
+            "Tarefas",
+            "Doadas",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_sharedtt(args):
+    """Compara a DFS paralela sem tabela de transposição, com uma cópia da
+    tabela em cada processo e com uma tabela em memória partilhada, contando
+    os acertos em estados guardados por outro processo."""
+    rows = []
+    configs = (
+        ("sem tabela", lambda: None),
+        ("uma por processo", lambda: TranspositionTable(args.size, "depth")),
+        ("partilhada", lambda: SharedTranspositionTable(args.size)),
+    )
+    for name, board, expected in test_boards(args):
+        for label, make in configs:
+            table = make()
+            stats = {}
+            problem, goal_node, elapsed = run_board(
+                board,
+                search=functools.partial(
+                    SEARCHES["parallel"],
+                    table=table,
+                    workers=args.workers,
+                    stats=stats,
+                ),
+            )
+            if isinstance(table, SharedTranspositionTable):
+                lookups = table.hits + table.misses
+                counters = [
+                    table.hits,
+                    table.shared_hits,
+                    "{:.1%}".format(table.shared_hits / lookups if lookups else 0),
+                    table.stores,
+                ]
+            else:
+                counters = ["-"] * 4
+            rows.append(
+                [
+                    name,
+                    label,
+                    "{:.1f} ms".format(elapsed * 1e3),
+                    problem.goal_tests + stats["nodes"],
+                ]
+                + counters
+                + ["sim" if solved(problem, goal_node, expected) else "NÃO"]
+            )
+    print("{} processos, {} processadores".format(args.workers, os.cpu_count()))
+    print()
+    print_table(
+        [
+            "Teste",
+            "Tabela",
+            "Tempo",
+            "Nós expandidos",
+            "Acertos",
+            "Acertos de outros",
+            "Taxa de acertos de outros",
+            "Guardados",
+            "Correto",
+        ],
+        rows,
+    )
+
+
+def bench_portfolio(args):
+    """Compara cada estratégia de PORTFOLIO sozinha com a procura portfolio,
+    que as corre todas em paralelo, nos testes e em versões esparsas das suas
+    soluções. Cada execução é um processo takuzu.py à parte, com o tempo
+    limite 'limit'; a estratégia vencedora é lida do --portfolio-log."""
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        log = os.path.join(tmp, "portfolio.tsv")
+        for name, board, expected in test_boards(args):
+            text = "{}\n{}\n".format(board.dim, board)
+            times = {}
+            winner, ok = "-", False
+            for strategy in list(PORTFOLIO) + [None]:
+                command = [sys.executable, TAKUZU, "--search", "portfolio"]
+                if strategy is not None:
+                    command += ["--portfolio", strategy]
+                else:
+                    command += ["--portfolio-log", log]
+                start = time.perf_counter()
+                try:
+                    res = subprocess.run(
+                        command,
+                        input=text,
+                        capture_output=True,
+                        text=True,
+                        timeout=args.limit,
+                    )
+                except subprocess.TimeoutExpired:
+                    times[strategy] = None
+                    continue
+                times[strategy] = time.perf_counter() - start
+                if strategy is None and res.returncode == 0:
+                    ok = expected is None or res.stdout.strip() == expected
+                    with open(log) as f:
+                        winner = f.read().splitlines()[-1].split("\t")[2]
+            rows.append(
+                [name]
+                + [
+                    (
+                        "> {} s".format(args.limit)
+                        if times[strategy] is None
+                        else "{:.1f} ms".format(times[strategy] * 1e3)
+                    )
+                    for strategy in list(PORTFOLIO) + [None]
+                ]
+                + [winner, "sim" if ok else "NÃO"]
+            )
+    print(
+        "{} processadores; tempos de processos takuzu.py completos".format(
+            os.cpu_count()
+        )
+    )
+    print()
+    print_table(
+        ["Teste"] + list(PORTFOLIO) + ["portfolio", "Vencedora", "Correto"], rows
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("backend", help="custo por nó de cada representação")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.set_defaults(func=bench_backend)
+    p = sub.add_parser("trail", help="DFS com cópia vs. DFS com desfazer")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.set_defaults(func=bench_trail)
+    p = sub.add_parser("propagate", help="regras uma a uma vs. propagação")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.set_defaults(func=bench_propagate)
+    p = sub.add_parser("unique", help="efeito da regra das filas distintas")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.set_defaults(func=bench_unique)
+    p = sub.add_parser("rules", help="regras célula a célula vs. vetorizadas")
+    p.add_argument("--sizes", nargs=2, type=int, default=(4, 50))
+    p.add_argument("--samples", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_rules)
+    p = sub.add_parser("patterns", help="tabelas de filas válidas e seu efeito")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--samples", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_patterns)
+    p = sub.add_parser("domains", help="propagação vs. domínios de filas")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.set_defaults(func=bench_domains)
+    p = sub.add_parser("probe", help="efeito da sondagem antes de ramificar")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--budgets", nargs="+", type=int, default=(0, 8, 32))
+    p.add_argument("--keep", type=float, default=0.5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_probe)
+    p = sub.add_parser("branching", help="políticas de escolha da célula")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--keep", type=float, default=0.5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_branching)
+    p = sub.add_parser("zobrist", help="estados por identidade vs. conteúdo")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--keep", type=float, default=0.5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_zobrist)
+    p = sub.add_parser("tt", help="tabela de transposição na procura DFS")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--sizes", nargs="+", type=int, default=(256, 65536))
+    p.add_argument("--keep", type=float, default=0)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_tt)
+    p = sub.add_parser("queue", help="fila de prioridade original vs. indexada")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--frontier", nargs="+", type=int, default=(500, 2000, 8000))
+    p.add_argument("--keep", type=float, default=0.5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_queue)
+    p = sub.add_parser("lazy", help="DFS com lista de filhos vs. preguiçosa")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--keep", type=float, default=0)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_lazy)
+    p = sub.add_parser("delta", help="estados com tabuleiro vs. só com jogadas")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--every", nargs="+", type=int, default=(4, 16))
+    p.add_argument("--keep", type=float, default=0.5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_delta)
+    p = sub.add_parser("pack", help="fronteira com tabuleiros vs. codificada")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--keep", type=float, default=0.5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_pack)
+    p = sub.add_parser("spill", help="fronteira em memória vs. escrita em disco")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--capacity", type=int, nargs="+", default=[64, 16])
+    p.add_argument("--keep", type=float, default=0.5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_spill)
+    p = sub.add_parser("slots", help="memória por nó das procuras DFS e gananciosa")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.set_defaults(func=bench_slots)
+    p = sub.add_parser("arena", help="tabuleiros alocados à parte vs. numa arena")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--keep", type=float, default=0)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_arena)
+    p = sub.add_parser("batch", help="um processo por tabuleiro vs. --batch")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--repeat", type=int, nargs="+", default=[1, 10])
+    p.set_defaults(func=bench_batch)
+    p = sub.add_parser("pool", help="--batch com vários processos")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--chunk", type=int, default=8)
+    p.set_defaults(func=bench_pool)
+    p = sub.add_parser("parallel", help="DFS num processo vs. DFS paralela")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.add_argument("--keep", type=float, default=0.5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_parallel)
+    p = sub.add_parser("sharedtt", help="DFS paralela com tabela partilhada")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--size", type=int, default=2**16)
+    p.add_argument("--keep", type=float, default=0.5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_sharedtt)
+    p = sub.add_parser("portfolio", help="cada estratégia vs. procura portfolio")
+    p.add_argument("tests", nargs="?", default=TESTS)
+    p.add_argument("--keep", type=float, default=0.5)
+    p.add_argument("--limit", type=float, default=60)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_portfolio)
+    args = parser.parse_args()
+    args.func(args)
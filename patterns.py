@@ -0,0 +1,186 @@
+# patterns.py: Índice das filas válidas de um tabuleiro de Takuzu
+# Grupo 07:
+# 99251 João Nuno Cardoso
+# 99259 José João Ferreira
+
+import collections
+import os
+
+import numpy as np
+
+# Pasta onde as tabelas de filas válidas são guardadas entre execuções
+CACHE_DIR = os.environ.get(
+    "TAKUZU_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "takuzu")
+)
+# Dimensão máxima para a qual se constrói a tabela (34 ocupa cerca de 44 MiB)
+MAX_DIM = 34
+
+
+def line_masks(line) -> tuple:
+    """Devolve o par (preenchidas, uns) de máscaras de bits de uma fila com
+    valores 0, 1 ou 2, em que o bit k corresponde à posição k."""
+    mask = values = 0
+    for k, v in enumerate(line):
+        if v != 2:
+            mask |= 1 << k
+            values |= v << k
+    return mask, values
+
+
+def enumerate_lines(dim: int):
+    """Devolve um array ordenado de uint64 com todas as filas completas válidas
+    de dimensão 'dim' (sem três valores iguais seguidos e com o número certo de
+    0's e 1's), como máscaras dos 1's. As filas são construídas posição a
+    posição, descartando logo os prefixos inválidos."""
+    maxc = (dim + 1) // 2
+    lines = np.zeros(1, dtype=np.uint64)
+    ones = np.zeros(1, dtype=np.int8)
+    for k in range(dim):
+        new_lines = []
+        new_ones = []
+        for bit in (0, 1):
+            o = ones + bit
+            ok = (o <= maxc) & (k + 1 - o <= maxc)
+            if k >= 2:
+                b1 = (lines >> np.uint64(k - 1)) & np.uint64(1)
+                b2 = (lines >> np.uint64(k - 2)) & np.uint64(1)
+                ok &= ~((b1 == bit) & (b2 == bit))
+            new_lines.append(lines[ok] | np.uint64(bit << k))
+            new_ones.append(o[ok])
+        lines = np.concatenate(new_lines)
+        ones = np.concatenate(new_ones)
+    return np.sort(lines)
+
+
+def load_lines(dim: int, cache_dir=CACHE_DIR):
+    """Devolve a tabela de filas válidas de dimensão 'dim', lida da cache em
+    disco (mapeada em memória) ou construída e guardada na primeira utilização."""
+    path = os.path.join(cache_dir, "lines_{}.npy".format(dim))
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        # Escrever num ficheiro temporário para que outro processo nunca leia
+        # uma tabela incompleta
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp, "wb") as f:
+            np.save(f, enumerate_lines(dim))
+        os.replace(tmp, path)
+    return np.load(path, mmap_mode="r")
+
+
+class PatternIndex:
+    """Índice das filas válidas de uma dimensão, que permite obter todas as
+    formas de completar uma fila parcialmente preenchida. Cada fila parcial é
+    identificada pelo par (máscara das posições preenchidas, valores nessas
+    posições); os resultados são guardados numa cache LRU."""
+
+    # Número máximo de posições vazias percorridas na pesquisa por intervalos
+    MAX_FREE = 6
+    # Tamanho mínimo da tabela a partir do qual se usa a pesquisa por intervalos
+    MIN_SEARCH = 4096
+
+    def __init__(self, dim: int, cache_dir=CACHE_DIR, maxsize=4096):
+        if dim > MAX_DIM:
+            raise ValueError("Não há tabela de filas para dimensão {}".format(dim))
+        self.dim = dim
+        self.full = (1 << dim) - 1
+        self.lines = load_lines(dim, cache_dir)
+        self.maxsize = maxsize
+        # (máscara, valores) -> (completações, 1's comuns, 0's comuns)
+        self.cache = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.lines)
+
+    def lookup(self, mask: int, values: int) -> tuple:
+        """Devolve as completações da fila parcial (mask, values) e as máscaras
+        das posições que são 1, e que são 0, em todas elas."""
+        key = (mask, values)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return self.cache[key]
+        lines = self.candidates(mask, values)
+        res = lines[(lines & np.uint64(mask)) == np.uint64(values)]
+        if len(res):
+            ones = int(np.bitwise_and.reduce(res))
+            zeros = ~int(np.bitwise_or.reduce(res)) & self.full
+        else:
+            ones = zeros = 0
+        self.cache[key] = (res, ones, zeros)
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+        return res, ones, zeros
+
+    def candidates(self, mask: int, values: int):
+        """Devolve as filas da tabela que coincidem com a fila parcial nas
+        posições mais altas. Como a tabela está ordenada, as filas com um dado
+        valor nessas posições formam um intervalo contíguo, encontrado por
+        pesquisa binária; as posições vazias entre elas (até MAX_FREE) são
+        percorridas com um intervalo por cada combinação de valores."""
+        # Em tabelas pequenas é mais rápido percorrer tudo
+        if len(self.lines) <= self.MIN_SEARCH:
+            return self.lines
+        k = self.dim
+        free = []
+        while k > 0:
+            if not (mask >> (k - 1)) & 1:
+                if len(free) == self.MAX_FREE:
+                    break
+                free.append(k - 1)
+            k -= 1
+        if k == self.dim:
+            return self.lines
+        base = values >> k << k
+        parts = []
+        for combo in range(2 ** len(free)):
+            top = base
+            for n, p in enumerate(free):
+                top |= ((combo >> n) & 1) << p
+            lo, hi = np.searchsorted(
+                self.lines, np.array([top, top + (1 << k)], dtype=np.uint64)
+            )
+            if lo < hi:
+                parts.append(self.lines[lo:hi])
+        return np.concatenate(parts) if parts else self.lines[:0]
+
+    def completions(self, mask: int, values: int):
+        """Devolve um array com todas as filas válidas que coincidem com
+        'values' nas posições de 'mask'."""
+        return self.lookup(mask, values)[0]
+
+    def forced(self, line, exclude=()):
+        """Devolve a lista de pares (posição, valor) das células vazias da fila
+        que têm o mesmo valor em todas as formas válidas de a completar, sem
+        contar as filas em 'exclude' (máscaras dos 1's de filas completas que não
+        podem ser repetidas). Devolve None se a fila não puder ser completada."""
+        mask, values = line_masks(line)
+        res, ones, zeros = self.lookup(mask, values)
+        # Só é preciso voltar a filtrar se alguma fila excluída for uma completação
+        exclude = [e for e in exclude if (e & mask) == values]
+        if exclude:
+            res = res[~np.isin(res, np.array(exclude, dtype=np.uint64))]
+            if len(res):
+                ones = int(np.bitwise_and.reduce(res))
+                zeros = ~int(np.bitwise_or.reduce(res)) & self.full
+        if not len(res):
+            return None
+        forced = []
+        for k in range(self.dim):
+            if not (mask >> k) & 1:
+                if (ones >> k) & 1:
+                    forced.append((k, 1))
+                elif (zeros >> k) & 1:
+                    forced.append((k, 0))
+        return forced
+
+
+_indexes = {}
+
+
+def get_index(dim: int):
+    """Devolve o índice de filas válidas de dimensão 'dim', partilhado por todos
+    os problemas, ou None se a dimensão for demasiado grande."""
+    if dim > MAX_DIM:
+        return None
+    if dim not in _indexes:
+        _indexes[dim] = PatternIndex(dim)
+    return _indexes[dim]
@@ -6,6 +6,8 @@ then create problem instances and solve them with calls to the various search
 functions.
 """
 
+import multiprocessing
+import queue
 import sys
 from collections import deque
 
@@ -48,6 +50,36 @@ class Problem:
         else:
             return state == self.goal
 
+    def do_action(self, state, action):
+        """Apply the given action to state in place. Only needed by search
+        algorithms that mutate a single state instead of creating a new one
+        per node, such as depth_first_trail_search."""
+        raise NotImplementedError
+
+    def undo_action(self, state, action):
+        """Revert an action previously applied to state by do_action. Actions
+        are always undone in the reverse order in which they were applied."""
+        raise NotImplementedError
+
+    def pack_state(self, state):
+        """Return a compact, hashable encoding of state, equal for equal
+        states. Used by best_first_graph_search(pack=True) to store the frontier
+        and explored set, where encodings are compared in place of the states
+        to break ties in f, so they should be ordered as the states are. By
+        default the state itself is used."""
+        return state
+
+    def unpack_state(self, data):
+        """Rebuild a state from its encoding by pack_state."""
+        return data
+
+    def release(self, state):
+        """Called by some search algorithms (depth_first_tree_search,
+        depth_first_lazy_search and best_first_graph_search) when a state will
+        not be used again, so that its memory can be reused for new states. The
+        state's hash must still be valid afterwards. By default does nothing."""
+        pass
+
     def path_cost(self, c, state1, action, state2):
         """Return the cost of a solution path that arrives at state2 from
         state1 via action, assuming cost c to get up to state1. If the problem
@@ -70,10 +102,13 @@ class Node:
     that this is a successor of) and to the actual state for this node. Note
     that if a state is arrived at by two paths, then there are two nodes with
     the same state. Also includes the action that got us to this state, and
-    the total path_cost (also known as g) to reach the node. Other functions
-    may add an f and h value; see best_first_graph_search and astar_search for
-    an explanation of how the f and h values are handled. You will not need to
-    subclass this class."""
+    the total path_cost (also known as g) to reach the node. The f and h
+    slots are left unset, to be filled by the functions that compute them;
+    see best_first_graph_search and astar_search for an explanation of how
+    the f and h values are handled. You will not need to subclass this class.
+    Nodes have no instance dictionary, only the fields in __slots__."""
+
+    __slots__ = ("state", "parent", "action", "path_cost", "depth", "f", "h")
 
     def __init__(self, state, parent=None, action=None, path_cost=0):
         """Create a search tree Node, derived from a parent by an action."""
@@ -200,27 +235,310 @@ def breadth_first_tree_search(problem):
     return None
 
 
-def depth_first_tree_search(problem):
+def depth_first_tree_search(problem, table=None):
     """
     [Figure 3.7]
     Search the deepest nodes in the search tree first.
     Search through the successors of a problem to find a goal.
     The argument frontier should be an empty queue.
     Repeats infinitely in case of loops.
+    If a TranspositionTable is given, states whose whole subtree was searched
+    without finding a goal are stored in it (by hash) and skipped when reached
+    again through another path.
+    Each state is released (see Problem.release) once its node is expanded or
+    skipped.
     """
     try:
         frontier = [Node(problem.initial)]  # Stack
 
         while frontier:
             node = frontier.pop()
+            if table is not None:
+                if isinstance(node, tuple):
+                    # Marker: every descendant of the node has been searched
+                    table.add(hash(node[0].state), node[0].depth)
+                    continue
+                if hash(node.state) in table:
+                    problem.release(node.state)
+                    continue
             if problem.goal_test(node.state):
                 return node
+            if table is not None:
+                frontier.append((node,))
             frontier.extend(node.expand(problem))
+            problem.release(node.state)
     except KeyboardInterrupt:
         exit(1)
     return None
 
 
+def depth_first_lazy_search(problem, table=None):
+    """
+    Depth-first tree search that expands nodes lazily. Instead of generating
+    every child of a node at once, it keeps a stack of frames, each with a
+    node and an iterator over its untried actions, and only builds a child
+    (calling problem.result) when it is about to be explored. Nodes are
+    visited in the same order as depth_first_tree_search, so both return the
+    same goal, but children after the goal are never built.
+    A TranspositionTable can be given, as in depth_first_tree_search.
+    Each state is released (see Problem.release) once all its children have
+    been explored, or when it is skipped.
+    """
+    node = Node(problem.initial)
+    if problem.goal_test(node.state):
+        return node
+    # The last action is explored first, as when popping children off a stack
+    frames = [(node, reversed(list(problem.actions(node.state))))]
+
+    while frames:
+        node, actions = frames[-1]
+        action = next(actions, None)
+        if action is None:
+            frames.pop()
+            if table is not None:
+                table.add(hash(node.state), node.depth)
+            problem.release(node.state)
+            continue
+        child = node.child_node(problem, action)
+        if table is not None and hash(child.state) in table:
+            problem.release(child.state)
+            continue
+        if problem.goal_test(child.state):
+            return child
+        frames.append((child, reversed(list(problem.actions(child.state)))))
+    return None
+
+
+def depth_first_trail_search(problem, table=None):
+    """
+    Depth-first tree search that keeps a single state and never copies it.
+    Each action is applied in place with problem.do_action and recorded on a
+    trail (undo stack); on backtrack it is reverted with problem.undo_action.
+    Nodes are visited in the same order as depth_first_tree_search, so both
+    return the same goal. The returned node and its ancestors all share the
+    final (goal) state; use node.solution() for the actions taken.
+    A TranspositionTable can be given, as in depth_first_tree_search.
+    """
+    state = problem.initial
+    if problem.goal_test(state):
+        return Node(state)
+    trail = []
+    pending = [list(problem.actions(state))]  # Stack of untried actions per level
+
+    while pending:
+        actions = pending[-1]
+        if not actions:
+            pending.pop()
+            if table is not None:
+                table.add(hash(state), len(trail))
+            if trail:
+                problem.undo_action(state, trail.pop())
+            continue
+        action = actions.pop()
+        problem.do_action(state, action)
+        if table is not None and hash(state) in table:
+            problem.undo_action(state, action)
+            continue
+        trail.append(action)
+        if problem.goal_test(state):
+            node = Node(state)
+            for action in trail:
+                node = Node(
+                    state,
+                    node,
+                    action,
+                    problem.path_cost(node.path_cost, state, action, state),
+                )
+            return node
+        pending.append(list(problem.actions(state)))
+    return None
+
+
+def _parallel_worker(worker, problem, table, tasks, results, *args):
+    """Worker of depth_first_parallel_search: runs _parallel_subtrees and
+    reports its counts, or the exception that stopped it."""
+    try:
+        nodes, donated = _parallel_subtrees(
+            worker, problem, table, tasks, results, *args
+        )
+    except Exception as e:
+        results.put(("error", worker, repr(e)))
+    else:
+        results.put(("done", nodes, donated))
+
+
+def _parallel_subtrees(
+    worker, problem, table, tasks, results, idle, live, found, check
+):
+    """Searches the subtrees taken from tasks, donating the shallowest node of
+    its stack while other workers are idle. Returns the numbers of nodes
+    searched and donated."""
+    if isinstance(table, SharedTranspositionTable):
+        table.attach(worker)
+    nodes = donated = 0
+    waiting = False
+    while not found.is_set():
+        try:
+            data, path = tasks.get(timeout=0.01)
+        except queue.Empty:
+            if not waiting:
+                waiting = True
+                with idle.get_lock():
+                    idle.value += 1
+            if live.value == 0:
+                break
+            continue
+        if waiting:
+            waiting = False
+            with idle.get_lock():
+                idle.value -= 1
+        frontier = [Node(problem.unpack_state(data))]
+        steps = 0
+        while frontier:
+            steps += 1
+            if steps % check == 0:
+                if found.is_set():
+                    break
+                if idle.value > 0:
+                    # Donate the shallowest node that is still to be searched
+                    for k, node in enumerate(frontier[:-1]):
+                        if isinstance(node, Node):
+                            del frontier[k]
+                            with live.get_lock():
+                                live.value += 1
+                            data = problem.pack_state(node.state)
+                            tasks.put((data, path + node.solution()))
+                            donated += 1
+                            break
+            node = frontier.pop()
+            if table is not None:
+                if isinstance(node, tuple):
+                    # Depth from the root of the whole search, not of the task,
+                    # so that entries from different tasks can be compared
+                    table.add(hash(node[0].state), len(path) + node[0].depth)
+                    continue
+                if hash(node.state) in table:
+                    continue
+            nodes += 1
+            if problem.goal_test(node.state):
+                if not found.is_set():
+                    found.set()
+                    data = problem.pack_state(node.state)
+                    results.put(("goal", data, path + node.solution()))
+                break
+            if table is not None:
+                frontier.append((node,))
+            frontier.extend(node.expand(problem))
+        with live.get_lock():
+            live.value -= 1
+    return nodes, donated
+
+
+def depth_first_parallel_search(
+    problem, table=None, workers=None, split=4, check=16, stats=None
+):
+    """
+    Depth-first tree search spread over `workers` processes (by default, one
+    per CPU). The tree is first expanded breadth-first until there are
+    `split` nodes per worker; each becomes a task, with the state encoded by
+    problem.pack_state and the actions from the root. Each worker takes a
+    task from a shared queue and searches its subtree depth first. Every
+    `check` nodes it stops if another worker found a goal, and, while some
+    worker is idle, donates the shallowest pending node of its stack as a new
+    task (so idle workers steal the largest untried subtrees). The search
+    ends when a goal is found or no task is left. If a worker raises an
+    exception or dies, the others are stopped and RuntimeError is raised,
+    since the subtree it held was not searched.
+    Workers are forked, so the problem is not pickled, but states must be
+    picklable once packed. A TranspositionTable is copied to each worker and
+    used as in depth_first_tree_search; a SharedTranspositionTable is shared
+    by all of them, so a state found dead by one worker is skipped by the
+    others, and each worker counts in its own row (1 to `workers`). The
+    returned node and its ancestors all share the goal state, as in
+    depth_first_trail_search. If a dict is given as `stats`, the nodes
+    searched by the workers, the tasks and the donated nodes are counted in
+    it.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    if stats is not None:
+        stats.update(nodes=0, tasks=0, donated=0)
+    root = Node(problem.initial)
+    frontier = deque([root])
+    while frontier and len(frontier) < workers * split:
+        node = frontier.popleft()
+        if problem.goal_test(node.state):
+            return node
+        frontier.extend(reversed(node.expand(problem)))
+    if not frontier:
+        return None
+
+    if isinstance(table, SharedTranspositionTable):
+        # One row of counters for this process and one for each worker
+        table.reserve(workers + 1)
+    context = multiprocessing.get_context("fork")
+    tasks, results = context.Queue(), context.Queue()
+    idle, live = context.Value("i", 0), context.Value("i", len(frontier))
+    found = context.Event()
+    # Keep the depth-first order: the first tasks taken are the ones that
+    # depth_first_tree_search would explore first
+    for node in frontier:
+        tasks.put((problem.pack_state(node.state), node.solution()))
+    processes = [
+        context.Process(
+            target=_parallel_worker,
+            args=(k + 1, problem, table, tasks, results, idle, live, found, check),
+        )
+        for k in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    goal = None
+    nodes = donated = done = 0
+    try:
+        while done < workers:
+            try:
+                message = results.get(timeout=0.1)
+            except queue.Empty:
+                # A worker that died without reporting (e.g. killed) took its
+                # task with it, so the search can neither finish nor tell
+                # that there is no solution
+                for k, process in enumerate(processes):
+                    if process.exitcode not in (None, 0):
+                        raise RuntimeError(
+                            "Worker {} exited with code {}.".format(
+                                k + 1, process.exitcode
+                            )
+                        )
+                continue
+            if message[0] == "error":
+                raise RuntimeError(
+                    "Worker {} failed: {}".format(message[1], message[2])
+                )
+            if message[0] == "goal":
+                goal = message
+                continue
+            nodes += message[1]
+            donated += message[2]
+            done += 1
+    finally:
+        found.set()
+        for process in processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+    if stats is not None:
+        stats.update(nodes=nodes, tasks=len(frontier) + donated, donated=donated)
+    if goal is None:
+        return None
+    state = problem.unpack_state(goal[1])
+    node = Node(state)
+    for action in goal[2]:
+        node = Node(
+            state, node, action, problem.path_cost(node.path_cost, state, action, state)
+        )
+    return node
+
+
 def depth_first_graph_search(problem):
     """
     [Figure 3.7]
@@ -231,18 +549,21 @@ def depth_first_graph_search(problem):
     If two paths reach a state, only use the first one.
     """
     frontier = [(Node(problem.initial))]  # Stack
+    # States of the nodes in the frontier, kept alongside it so that testing
+    # membership does not scan the frontier
+    in_frontier = {frontier[0].state}
 
     explored = set()
     while frontier:
         node = frontier.pop()
+        in_frontier.remove(node.state)
         if problem.goal_test(node.state):
             return node
         explored.add(node.state)
-        frontier.extend(
-            child
-            for child in node.expand(problem)
-            if child.state not in explored and child not in frontier
-        )
+        for child in node.expand(problem):
+            if child.state not in explored and child.state not in in_frontier:
+                frontier.append(child)
+                in_frontier.add(child.state)
     return None
 
 
@@ -256,33 +577,51 @@ def breadth_first_graph_search(problem):
     if problem.goal_test(node.state):
         return node
     frontier = deque([node])
+    in_frontier = {node.state}  # States in the frontier, as in depth_first_graph_search
     explored = set()
     while frontier:
         node = frontier.popleft()
+        in_frontier.remove(node.state)
         explored.add(node.state)
         for child in node.expand(problem):
-            if child.state not in explored and child not in frontier:
+            if child.state not in explored and child.state not in in_frontier:
                 if problem.goal_test(child.state):
                     return child
                 frontier.append(child)
+                in_frontier.add(child.state)
     return None
 
 
-def best_first_graph_search(problem, f, display=False):
+def best_first_graph_search(
+    problem, f, display=False, queue=IndexedPriorityQueue, pack=False
+):
     """Search the nodes with the lowest f scores first.
     You specify the function f(node) that you want to minimize; for example,
     if f is a heuristic estimate to the goal, then we have greedy best
     first search; if f is node.depth then we have breadth-first search.
     There is a subtlety: the line "f = memoize(f, 'f')" means that the f
     values will be cached on the nodes as they are computed. So after doing
-    a best first search you can examine the f values of the path returned."""
+    a best first search you can examine the f values of the path returned.
+    The frontier is an instance of `queue`, a PriorityQueue class.
+    With pack=True, the states of the nodes waiting in the frontier and of the
+    expanded nodes are kept encoded by problem.pack_state (the explored set
+    holds the encodings directly), and decoded when a node is popped.
+    States are released (see Problem.release) once packed or expanded (with
+    pack=True), or when their node is discarded or replaced in the frontier
+    by a node with a lower f."""
     f = memoize(f, "f")
     node = Node(problem.initial)
-    frontier = PriorityQueue("min", f)
+    if pack:
+        f(node)
+        node.state = problem.pack_state(node.state)
+    frontier = queue("min", f)
     frontier.append(node)
     explored = set()
     while frontier:
         node = frontier.pop()
+        if pack:
+            key = node.state
+            node.state = problem.unpack_state(key)
         if problem.goal_test(node.state):
             if display:
                 print(
@@ -292,14 +631,29 @@ def best_first_graph_search(problem, f, display=False):
                     "paths remain in the frontier",
                 )
             return node
-        explored.add(node.state)
-        for child in node.expand(problem):
+        if pack:
+            children = node.expand(problem)
+            problem.release(node.state)
+            # The node is only kept as the parent of its children
+            node.state = key
+            explored.add(key)
+            for child in children:
+                f(child)
+                state = child.state
+                child.state = problem.pack_state(state)
+                problem.release(state)
+        else:
+            explored.add(node.state)
+            children = node.expand(problem)
+        for child in children:
             if child.state not in explored and child not in frontier:
                 frontier.append(child)
-            elif child in frontier:
-                if f(child) < frontier[child]:
-                    del frontier[child]
-                    frontier.append(child)
+            elif child in frontier and f(child) < frontier[child]:
+                replaced = frontier.decrease_key(child)
+                if not pack and replaced is not None:
+                    problem.release(replaced.state)
+            elif not pack:
+                problem.release(child.state)
     return None
 
 
@@ -427,10 +781,10 @@ greedy_best_first_graph_search = best_first_graph_search
 
 
 # Greedy best-first search is accomplished by specifying f(n) = h(n).
-def greedy_search(problem, h=None):
+def greedy_search(problem, h=None, pack=False, queue=IndexedPriorityQueue):
     """f(n) = h(n)"""
     h = memoize(h or problem.h, "h")
-    return best_first_graph_search(problem, h)
+    return best_first_graph_search(problem, h, queue=queue, pack=pack)
 
 
 def astar_search(problem, h=None, display=False):
@@ -1627,6 +1981,22 @@ class InstrumentedProblem(Problem):
             self.found = state
         return result
 
+    def do_action(self, state, action):
+        self.states += 1
+        return self.problem.do_action(state, action)
+
+    def undo_action(self, state, action):
+        return self.problem.undo_action(state, action)
+
+    def pack_state(self, state):
+        return self.problem.pack_state(state)
+
+    def unpack_state(self, data):
+        return self.problem.unpack_state(data)
+
+    def release(self, state):
+        return self.problem.release(state)
+
     def path_cost(self, c, state1, action, state2):
         return self.problem.path_cost(c, state1, action, state2)
 
@@ -3,18 +3,118 @@
 # 99251 João Nuno Cardoso
 # 99259 José João Ferreira
 
+import argparse
+import collections
+import functools
+import itertools
+import multiprocessing
+import multiprocessing.connection
 import numpy as np
+import os
+import random
+import signal
 import sys
+import time
 
+from patterns import MAX_DIM, get_index, line_masks
 from search import (
     Problem,
     Node,
+    IndexedPriorityQueue,
+    SharedTranspositionTable,
+    SpillingPriorityQueue,
+    TranspositionTable,
     depth_first_tree_search,
+    depth_first_lazy_search,
+    depth_first_parallel_search,
+    depth_first_trail_search,
     greedy_search,
 )
 
 
+def read_matrix(stream):
+    """Lê a dimensão N seguida de N linhas de um ficheiro ou stream de texto
+    e devolve o tabuleiro como lista de listas de inteiros."""
+    dim = int(stream.readline())
+    mat = []
+    for f in range(dim):
+        mat.append([int(i) for i in stream.readline().split()])
+    return mat
+
+
+def read_matrices(stream):
+    """Lê uma sequência de tabuleiros no mesmo formato, um a seguir ao outro,
+    até ao fim do stream (ignorando linhas em branco entre eles), e devolve-os
+    um a um como listas de listas de inteiros."""
+    for line in stream:
+        if line.strip():
+            dim = int(line)
+            yield [[int(i) for i in stream.readline().split()] for f in range(dim)]
+
+
+def read_batch(source):
+    """Devolve pares (nome, tabuleiro) para todos os tabuleiros de 'source': os
+    ficheiros .in de uma pasta, por ordem alfabética, ou, se for "-", os
+    tabuleiros lidos do standard input, numerados a partir de 1."""
+    if source == "-":
+        for n, mat in enumerate(read_matrices(sys.stdin), 1):
+            yield str(n), mat
+        return
+    for name in sorted(f for f in os.listdir(source) if f.endswith(".in")):
+        with open(os.path.join(source, name)) as f:
+            yield name[:-3], read_matrix(f)
+
+
+def update_lines(lines: dict, key, delta: int):
+    """Atualiza o multiconjunto de filas completas 'lines' (valores -> número
+    de filas com esses valores)."""
+    n = lines.get(key, 0) + delta
+    if n:
+        lines[key] = n
+    else:
+        del lines[key]
+
+
+_zobrist_keys = {}
+
+
+def zobrist_keys(dim: int) -> list:
+    """Devolve as chaves de Zobrist de um tabuleiro de dimensão 'dim': para cada
+    célula, um par de inteiros aleatórios de 64 bits (um por valor). O hash de
+    um tabuleiro é o ou-exclusivo das chaves das células preenchidas. As chaves
+    são geradas com uma semente fixa, pelo que são as mesmas em cada execução."""
+    if dim not in _zobrist_keys:
+        rng = random.Random(dim)
+        _zobrist_keys[dim] = [
+            [(rng.getrandbits(64), rng.getrandbits(64)) for j in range(dim)]
+            for i in range(dim)
+        ]
+    return _zobrist_keys[dim]
+
+
+def pack_array(a) -> bytes:
+    """Codifica um tabuleiro (array de 0's, 1's e 2's) em bytes: a dimensão,
+    seguida dos bits das células preenchidas e dos bits das células com 1, cada
+    conjunto arredondado a um número inteiro de bytes."""
+    return (
+        bytes([len(a)]) + np.packbits(a != 2).tobytes() + np.packbits(a == 1).tobytes()
+    )
+
+
+def unpack_array(data: bytes):
+    """Descodifica um tabuleiro codificado com pack_array."""
+    dim = data[0]
+    n = dim * dim
+    size = (n + 7) // 8
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, offset=1))
+    filled = bits[:n]
+    ones = bits[size * 8 : size * 8 + n]
+    return np.where(filled, ones, 2).reshape(dim, dim)
+
+
 class TakuzuState:
+    __slots__ = ("board", "id", "last")
+
     state_id = 0
 
     def __init__(self, board: "Board", last):
@@ -26,17 +126,177 @@ class TakuzuState:
     def __lt__(self, other):
         return self.id < other.id
 
+    def __eq__(self, other):
+        """Dois estados são iguais se os tabuleiros tiverem o mesmo conteúdo,
+        para que as procuras em grafo detetem tabuleiros atingidos por caminhos
+        diferentes. Só se comparam as células se os hashes coincidirem."""
+        return (
+            isinstance(other, TakuzuState)
+            and self.board.zobrist == other.board.zobrist
+            and self.board.to_matrix() == other.board.to_matrix()
+        )
+
+    def __hash__(self):
+        return self.board.zobrist
+
+    def __getstate__(self):
+        # Os campos de todas as classes, exceto os que uma subclasse substitui
+        # por uma propriedade (o tabuleiro, que é reconstruído quando é pedido)
+        cls = type(self)
+        names = [n for c in cls.__mro__ for n in c.__dict__.get("__slots__", ())]
+        return {
+            name: getattr(self, name)
+            for name in names
+            if not isinstance(getattr(cls, name), property) and hasattr(self, name)
+        }
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+
+class PackedState:
+    """Estado codificado por Takuzu.pack_state: o tabuleiro em bytes e o id do
+    estado original. É igual (e tem o mesmo hash) a outro com os mesmos bytes,
+    mas é ordenado pelo id, para que a procura Greedy desempate os nós com o
+    mesmo valor de h pela mesma ordem que sem --pack."""
+
+    __slots__ = ("data", "id")
+
+    def __init__(self, data: bytes, id: int):
+        self.data = data
+        self.id = id
+
+    def __eq__(self, other):
+        return isinstance(other, PackedState) and self.data == other.data
+
+    def __hash__(self):
+        return hash(self.data)
+
+    def __lt__(self, other):
+        return self.id < other.id
+
+
+class TakuzuDeltaState(TakuzuState):
+    """Estado compacto: guarda apenas o estado pai e a ação que o gerou, e um
+    tabuleiro completo só a cada 'every' níveis de profundidade. O tabuleiro é
+    reconstruído quando é pedido, aplicando no máximo 'every' - 1 ações a uma
+    cópia do tabuleiro guardado mais próximo; os últimos tabuleiros
+    reconstruídos ficam numa pequena cache partilhada."""
+
+    __slots__ = ("depth", "snapshot", "parent", "action", "zobrist")
+
+    # Tabuleiros usados recentemente (id do estado -> tabuleiro)
+    cache = collections.OrderedDict()
+    cache_size = 8
+
+    def __init__(self, board: "Board", last, parent=None, action=None, every=1):
+        self.depth = parent.depth + 1 if parent is not None else 0
+        if self.depth % every == 0:
+            self.snapshot, self.parent, self.action = board, None, None
+        else:
+            self.snapshot, self.parent, self.action = None, parent, action
+        self.zobrist = board.zobrist
+        self.id = TakuzuState.state_id
+        self.last = last
+        TakuzuState.state_id += 1
+        self.remember(board)
+
+    def remember(self, board: "Board"):
+        cache = TakuzuDeltaState.cache
+        cache[self.id] = board
+        cache.move_to_end(self.id)
+        if len(cache) > TakuzuDeltaState.cache_size:
+            cache.popitem(last=False)
+
+    @property
+    def board(self):
+        if self.snapshot is not None:
+            return self.snapshot
+        cache = TakuzuDeltaState.cache
+        if self.id in cache:
+            cache.move_to_end(self.id)
+            return cache[self.id]
+        # Subir até um antecessor com o tabuleiro guardado ou em cache
+        actions = []
+        state = self
+        while state.snapshot is None and state.id not in cache:
+            actions.append(state.action)
+            state = state.parent
+        board = state.board.copy()
+        for action in reversed(actions):
+            for a in assignments(action):
+                board.set_number(*a)
+        self.remember(board)
+        return board
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, TakuzuState)
+            and hash(self) == hash(other)
+            and self.board.to_matrix() == other.board.to_matrix()
+        )
+
+    def __hash__(self):
+        return self.zobrist
+
 
 class Board:
-    """Representação interna de um tabuleiro de Takuzu."""
+    """Representação interna de um tabuleiro de Takuzu, com as células num array
+    de int8 (0, 1 ou 2 se estiver vazia)."""
 
-    def __init__(self, array, dim, empty_cells, row_tally, col_tally):
+    __slots__ = (
+        "array",
+        "dim",
+        "empty_cells",
+        "row_tally",
+        "col_tally",
+        "complete_rows",
+        "complete_cols",
+        "overfull",
+        "triples",
+        "zobrist",
+        "keys",
+        "arena",
+        "slot",
+    )
+
+    def __init__(
+        self,
+        array,
+        dim,
+        empty_cells,
+        row_tally,
+        col_tally,
+        complete_rows,
+        complete_cols,
+        overfull,
+        triples,
+        zobrist,
+        arena=None,
+        slot=None,
+    ):
         self.array = array
         self.dim = dim
         self.empty_cells = empty_cells
         # Listas de listas de dimensão 2 que contêm o número de 0's e 1's, respetivamente
         self.row_tally = row_tally
         self.col_tally = col_tally
+        # Filas completas (tuplo de valores -> número de filas iguais), mantidas
+        # a cada jogada para que o teste objetivo seja de tempo constante
+        self.complete_rows = complete_rows
+        self.complete_cols = complete_cols
+        # Número de filas com mais 0's ou 1's do que o permitido
+        self.overfull = overfull
+        # Número de sequências de três valores iguais seguidos
+        self.triples = triples
+        # Hash de Zobrist do conteúdo, atualizado a cada jogada
+        self.zobrist = zobrist
+        self.keys = zobrist_keys(dim)
+        # Arena (BoardArena) onde estão o array e as contagens, e a posição que
+        # ocupam nela, ou None se foram alocados à parte
+        self.arena = arena
+        self.slot = slot
 
     def __repr__(self):
         res = ""
@@ -50,14 +310,14 @@ class Board:
         return res
 
     def get_row(self, row: int) -> tuple:
-        return tuple(self.array[row, : self.dim])
+        return tuple(self.array[row, : self.dim].tolist())
 
     def get_column(self, col: int) -> tuple:
-        return tuple(self.array[: self.dim, col])
+        return tuple(self.array[: self.dim, col].tolist())
 
     def get_number(self, row: int, col: int) -> int:
         """Devolve o valor na respetiva posição do tabuleiro."""
-        return self.array[row, col]
+        return int(self.array[row, col])
 
     def adjacent_vertical_numbers(self, row: int, col: int) -> tuple:
         """Devolve os valores imediatamente abaixo e acima,
@@ -90,47 +350,913 @@ class Board:
             v2 = self.array[row, col + 2] if (col < self.dim - 2) else (None)
         return (v1, v2)
 
-    @staticmethod
-    def parse_instance_from_stdin():
+    @classmethod
+    def parse_instance_from_stdin(cls):
         """Lê o test do standard input (stdin) que é passado como argumento
         e retorna uma instância da classe Board."""
-        mat = []
-        dim = int(input())
-        for f in range(dim):
-            mat.append([int(i) for i in input().split()])
-        empty_cells = 0
-        row_tally = []
-        col_tally = []
-        for i in range(dim):
-            row_tally.append([0, 0])
-            col_tally.append([0, 0])
+        return cls.parse_instance(sys.stdin)
+
+    @classmethod
+    def parse_instance(cls, stream):
+        """Lê um tabuleiro no formato do enunciado (dimensão seguida das linhas)
+        a partir de um ficheiro ou stream de texto."""
+        return cls.from_matrix(read_matrix(stream))
+
+    @staticmethod
+    def from_matrix(mat):
+        """Constrói um tabuleiro a partir de uma lista de listas de inteiros.
+        Os contadores que set_number mantém são calculados de uma só vez sobre o
+        tabuleiro inteiro."""
+        dim = len(mat)
+        a = np.array(mat, dtype=np.int8).reshape(dim, dim)
+        maxc = (dim + 1) // 2
+        tallies = []
+        overfull = 0
+        triples = 0
+        complete = []
+        for t in (a, a.T):
+            tally = np.stack([(t == 0).sum(axis=1), (t == 1).sum(axis=1)], axis=1)
+            tallies.append(tally.tolist())
+            overfull += int((tally > maxc).sum())
+            triples += int(
+                (
+                    (t[:, :-2] == t[:, 1:-1])
+                    & (t[:, 1:-1] == t[:, 2:])
+                    & (t[:, 2:] != 2)
+                ).sum()
+            )
+            lines = {}
+            for line in t[tally.sum(axis=1) == dim].tolist():
+                update_lines(lines, tuple(line), 1)
+            complete.append(lines)
+        keys = zobrist_keys(dim)
+        zobrist = 0
+        for i, j in zip(*np.nonzero(a != 2)):
+            zobrist ^= keys[i][j][a[i, j]]
+        return Board(
+            a,
+            dim,
+            int((a == 2).sum()),
+            tallies[0],
+            tallies[1],
+            complete[0],
+            complete[1],
+            overfull,
+            triples,
+            zobrist,
+        )
+
+    def copy(self):
+        if self.arena is not None:
+            return self.arena.board(self)
+        return Board(
+            np.copy(self.array),
+            self.dim,
+            self.empty_cells,
+            [t.copy() for t in self.row_tally],
+            [t.copy() for t in self.col_tally],
+            self.complete_rows.copy(),
+            self.complete_cols.copy(),
+            self.overfull,
+            self.triples,
+            self.zobrist,
+        )
+
+    def apply_action(self, action):
+        board = self.copy()
+        board.set_number(*action)
+        return board
+
+    def apply_actions(self, actions):
+        """Devolve um novo tabuleiro com todas as atribuições aplicadas."""
+        board = self.copy()
+        for action in actions:
+            board.set_number(*action)
+        return board
+
+    def to_matrix(self) -> list:
+        """Devolve o tabuleiro como lista de listas de inteiros."""
+        return self.array.tolist()
+
+    def to_array(self):
+        """Devolve uma cópia do tabuleiro como array NumPy de int8."""
+        return self.array.copy()
+
+    def pack(self) -> bytes:
+        """Devolve o tabuleiro codificado em bytes: a dimensão seguida de dois
+        conjuntos de dim² bits, com as células preenchidas e as que têm 1."""
+        return pack_array(self.to_array())
+
+    @classmethod
+    def unpack(cls, data: bytes):
+        """Reconstrói um tabuleiro codificado com pack."""
+        return cls.from_matrix(unpack_array(data))
+
+    def __getstate__(self):
+        # A tabela de chaves de Zobrist é partilhada por todos os tabuleiros da
+        # mesma dimensão e não é guardada com cada um; um tabuleiro de uma arena
+        # é guardado com cópias do array e das contagens, fora dela
+        return {name: getattr(self, name) for name in self.__slots__[:-3]}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.keys = zobrist_keys(self.dim)
+        self.arena = self.slot = None
+
+    def release(self):
+        """Devolve à arena a posição ocupada pelo tabuleiro, que deixa de poder
+        ser usado (exceto o seu hash). Não faz nada fora de uma arena."""
+        if self.slot is not None:
+            self.arena.release(self.slot)
+            self.slot = None
+
+    def _triples_at(self, row: int, col: int) -> int:
+        """Número de sequências de três valores iguais seguidos que incluem a
+        célula (preenchida), na sua linha e na sua coluna."""
+        a = self.array
+        val = a[row, col]
+        n = 0
+        for s in range(max(col - 2, 0), min(col, self.dim - 3) + 1):
+            n += a[row, s] == a[row, s + 1] == a[row, s + 2] == val
+        for s in range(max(row - 2, 0), min(row, self.dim - 3) + 1):
+            n += a[s, col] == a[s + 1, col] == a[s + 2, col] == val
+        return int(n)
+
+    def set_number(self, row: int, col: int, val: int):
+        """Preenche a célula no próprio tabuleiro, sem o copiar."""
+        dim = self.dim
+        self.array[row, col] = val
+        self.zobrist ^= self.keys[row][col][val]
+        self.triples += self._triples_at(row, col)
+        self.empty_cells -= 1
+        self.row_tally[row][val] += 1
+        self.col_tally[col][val] += 1
+        maxc = (dim + 1) // 2
+        if self.row_tally[row][val] == maxc + 1:
+            self.overfull += 1
+        if self.col_tally[col][val] == maxc + 1:
+            self.overfull += 1
+        if sum(self.row_tally[row]) == dim:
+            update_lines(self.complete_rows, tuple(self.array[row].tolist()), 1)
+        if sum(self.col_tally[col]) == dim:
+            update_lines(self.complete_cols, tuple(self.array[:, col].tolist()), 1)
+
+    def clear_number(self, row: int, col: int):
+        """Esvazia uma célula preenchida com set_number."""
+        dim = self.dim
+        val = int(self.array[row, col])
+        if sum(self.row_tally[row]) == dim:
+            update_lines(self.complete_rows, tuple(self.array[row].tolist()), -1)
+        if sum(self.col_tally[col]) == dim:
+            update_lines(self.complete_cols, tuple(self.array[:, col].tolist()), -1)
+        maxc = (dim + 1) // 2
+        if self.row_tally[row][val] == maxc + 1:
+            self.overfull -= 1
+        if self.col_tally[col][val] == maxc + 1:
+            self.overfull -= 1
+        self.triples -= self._triples_at(row, col)
+        self.zobrist ^= self.keys[row][col][val]
+        self.array[row, col] = 2
+        self.empty_cells += 1
+        self.row_tally[row][val] -= 1
+        self.col_tally[col][val] -= 1
+
+
+class BoardArena:
+    """Memória reutilizável para os tabuleiros (Board) de uma dimensão: blocos
+    pré-alocados com as células (int8) e as contagens de 0's e 1's das linhas e
+    colunas de 'chunk' tabuleiros. Cada tabuleiro da arena ocupa uma posição,
+    identificada por um índice, e usa vistas desses blocos; as posições
+    libertadas voltam para uma lista livre e são reutilizadas. Quando não há
+    posições livres junta-se um novo bloco, sem mover os anteriores (a que os
+    tabuleiros existentes se referem). Conta as posições pedidas ('allocs'), as
+    que foram reutilizadas ('reused'), as que já foram usadas ('used') e o
+    máximo em uso ('peak')."""
+
+    def __init__(self, dim: int, chunk=256):
+        self.dim = dim
+        self.chunk = chunk
+        self.cells = []  # blocos (chunk, dim, dim) de int8
+        self.tallies = []  # blocos (chunk, 2, dim, 2): linhas e colunas
+        self.free = []
+        self.allocs = self.reused = self.in_use = self.peak = 0
+        self.used = 0  # número de posições já usadas alguma vez
+
+    def __len__(self):
+        """Número de posições da arena."""
+        return len(self.cells) * self.chunk
+
+    def alloc(self) -> int:
+        """Devolve o índice de uma posição livre, juntando um bloco se preciso."""
+        if not self.free:
+            base = len(self)
+            self.cells.append(np.empty((self.chunk, self.dim, self.dim), np.int8))
+            self.tallies.append(np.empty((self.chunk, 2, self.dim, 2), np.int16))
+            # As posições mais baixas são usadas primeiro
+            self.free.extend(range(base + self.chunk - 1, base - 1, -1))
+        slot = self.free.pop()
+        if slot < self.used:
+            self.reused += 1
+        else:
+            self.used = slot + 1
+        self.allocs += 1
+        self.in_use += 1
+        self.peak = max(self.peak, self.in_use)
+        return slot
+
+    def release(self, slot: int):
+        """Devolve a posição à lista livre."""
+        self.free.append(slot)
+        self.in_use -= 1
+
+    def board(self, source: Board) -> Board:
+        """Devolve uma cópia de 'source' numa posição da arena."""
+        slot = self.alloc()
+        c, k = divmod(slot, self.chunk)
+        cells = self.cells[c][k]
+        tallies = self.tallies[c][k]
+        cells[...] = source.array
+        tallies[0] = source.row_tally
+        tallies[1] = source.col_tally
+        return Board(
+            cells,
+            self.dim,
+            source.empty_cells,
+            tallies[0],
+            tallies[1],
+            source.complete_rows.copy(),
+            source.complete_cols.copy(),
+            source.overfull,
+            source.triples,
+            source.zobrist,
+            self,
+            slot,
+        )
+
+
+class BitBoard:
+    """Representação alternativa de um tabuleiro de Takuzu através de máscaras de bits.
+    Cada linha e cada coluna é guardada como um par de inteiros (uns, preenchidas):
+    o bit j da linha i corresponde à coluna j e o bit i da coluna j à linha i.
+    Suporta a mesma interface que Board, pelo que o Takuzu funciona sobre ambas."""
+
+    __slots__ = (
+        "dim",
+        "row_ones",
+        "row_filled",
+        "col_ones",
+        "col_filled",
+        "empty_cells",
+        "complete_rows",
+        "complete_cols",
+        "overfull",
+        "triples",
+        "zobrist",
+        "keys",
+    )
+
+    def __init__(
+        self,
+        dim,
+        row_ones,
+        row_filled,
+        col_ones,
+        col_filled,
+        empty_cells,
+        complete_rows,
+        complete_cols,
+        overfull,
+        triples,
+        zobrist,
+    ):
+        self.dim = dim
+        self.row_ones = row_ones
+        self.row_filled = row_filled
+        self.col_ones = col_ones
+        self.col_filled = col_filled
+        self.empty_cells = empty_cells
+        # Filas completas (máscara dos 1's -> número de filas iguais)
+        self.complete_rows = complete_rows
+        self.complete_cols = complete_cols
+        # Número de filas com mais 0's ou 1's do que o permitido
+        self.overfull = overfull
+        # Número de sequências de três valores iguais seguidos
+        self.triples = triples
+        # Hash de Zobrist do conteúdo, atualizado a cada jogada
+        self.zobrist = zobrist
+        self.keys = zobrist_keys(dim)
+
+    def __repr__(self):
+        return "\n".join(
+            "\t".join(str(v) for v in self.get_row(i)) for i in range(self.dim)
+        )
+
+    @property
+    def row_tally(self) -> list:
+        """Número de 0's e 1's de cada linha, obtido por contagem de bits."""
+        return [
+            [f.bit_count() - o.bit_count(), o.bit_count()]
+            for o, f in zip(self.row_ones, self.row_filled)
+        ]
+
+    @property
+    def col_tally(self) -> list:
+        """Número de 0's e 1's de cada coluna, obtido por contagem de bits."""
+        return [
+            [f.bit_count() - o.bit_count(), o.bit_count()]
+            for o, f in zip(self.col_ones, self.col_filled)
+        ]
+
+    @staticmethod
+    def _bit(ones: int, filled: int, k: int) -> int:
+        """Devolve o valor da posição k de uma fila (2 se estiver vazia)."""
+        return (ones >> k) & 1 if (filled >> k) & 1 else 2
+
+    def _line(self, ones: int, filled: int) -> tuple:
+        return tuple(self._bit(ones, filled, k) for k in range(self.dim))
+
+    def get_row(self, row: int) -> tuple:
+        return self._line(self.row_ones[row], self.row_filled[row])
+
+    def get_column(self, col: int) -> tuple:
+        return self._line(self.col_ones[col], self.col_filled[col])
+
+    def get_number(self, row: int, col: int) -> int:
+        """Devolve o valor na respetiva posição do tabuleiro."""
+        if (self.row_filled[row] >> col) & 1:
+            return (self.row_ones[row] >> col) & 1
+        return 2
+
+    def adjacent_vertical_numbers(self, row: int, col: int) -> tuple:
+        """Devolve os valores imediatamente abaixo e acima,
+        respectivamente."""
+        o, f = self.col_ones[col], self.col_filled[col]
+        v1 = self._bit(o, f, row + 1) if (row < self.dim - 1) else (None)
+        v2 = self._bit(o, f, row - 1) if (row > 0) else (None)
+        return (v1, v2)
+
+    def adjacent_horizontal_numbers(self, row: int, col: int) -> tuple:
+        """Devolve os valores imediatamente à esquerda e à direita,
+        respectivamente."""
+        o, f = self.row_ones[row], self.row_filled[row]
+        v1 = self._bit(o, f, col - 1) if (col > 0) else (None)
+        v2 = self._bit(o, f, col + 1) if (col < self.dim - 1) else (None)
+        return (v1, v2)
+
+    # Deslocamentos das duas posições consultadas por two_numbers, na fila respetiva
+    TWO_NUMBERS_OFFSETS = {
+        "below": (2, 1),
+        "above": (-1, -2),
+        "previous": (-2, -1),
+        "following": (1, 2),
+    }
+
+    def two_numbers(self, row: int, col: int, mode) -> tuple:
+        """Devolve os dois valores imediatamente abaixo, acima, à esquerda ou à direita,
+        dependendo da string argumento."""
+        if mode == "below" or mode == "above":
+            o, f, k = self.col_ones[col], self.col_filled[col], row
+        else:
+            o, f, k = self.row_ones[row], self.row_filled[row], col
+        d1, d2 = self.TWO_NUMBERS_OFFSETS[mode]
+        p1, p2 = k + d1, k + d2
+        if 0 <= p1 < self.dim:
+            v1 = (o >> p1) & 1 if (f >> p1) & 1 else 2
+        else:
+            v1 = None
+        if 0 <= p2 < self.dim:
+            v2 = (o >> p2) & 1 if (f >> p2) & 1 else 2
+        else:
+            v2 = None
+        return (v1, v2)
+
+    @classmethod
+    def parse_instance_from_stdin(cls):
+        """Lê o test do standard input (stdin) que é passado como argumento
+        e retorna uma instância da classe BitBoard."""
+        return cls.parse_instance(sys.stdin)
+
+    @classmethod
+    def parse_instance(cls, stream):
+        """Lê um tabuleiro no formato do enunciado (dimensão seguida das linhas)
+        a partir de um ficheiro ou stream de texto."""
+        return cls.from_matrix(read_matrix(stream))
+
+    @staticmethod
+    def from_matrix(mat):
+        """Constrói um tabuleiro a partir de uma lista de listas de inteiros."""
+        dim = len(mat)
+        board = BitBoard(
+            dim, [0] * dim, [0] * dim, [0] * dim, [0] * dim, dim**2, {}, {}, 0, 0, 0
+        )
         for i in range(dim):
             for j in range(dim):
-                val = mat[i][j]
-                if val != 2:
-                    empty_cells += 1
-                    row_tally[i][val] += 1
-                    col_tally[j][val] += 1
-        return Board(np.array(mat), dim, empty_cells, row_tally, col_tally)
+                if mat[i][j] != 2:
+                    board.set_number(i, j, mat[i][j])
+        return board
+
+    def copy(self):
+        return BitBoard(
+            self.dim,
+            self.row_ones.copy(),
+            self.row_filled.copy(),
+            self.col_ones.copy(),
+            self.col_filled.copy(),
+            self.empty_cells,
+            self.complete_rows.copy(),
+            self.complete_cols.copy(),
+            self.overfull,
+            self.triples,
+            self.zobrist,
+        )
 
     def apply_action(self, action):
-        array = np.copy(self.array)
-        array[action[0]][action[1]] = action[2]
-        new_empty_cells = self.empty_cells - 1
-        new_row_tally = []
-        new_col_tally = []
-        for i in range(self.dim):
-            new_row_tally.append(self.row_tally[i].copy())
-            new_col_tally.append(self.col_tally[i].copy())
-        new_row_tally[action[0]][action[2]] += 1
-        new_col_tally[action[1]][action[2]] += 1
-        return Board(array, self.dim, new_empty_cells, new_row_tally, new_col_tally)
+        board = self.copy()
+        board.set_number(*action)
+        return board
+
+    def apply_actions(self, actions):
+        """Devolve um novo tabuleiro com todas as atribuições aplicadas."""
+        board = self.copy()
+        for action in actions:
+            board.set_number(*action)
+        return board
+
+    def to_matrix(self) -> list:
+        """Devolve o tabuleiro como lista de listas de inteiros."""
+        return [list(self.get_row(i)) for i in range(self.dim)]
+
+    def to_array(self):
+        """Devolve uma cópia do tabuleiro como array NumPy de int8."""
+        return np.array(self.to_matrix(), dtype=np.int8)
+
+    def pack(self) -> bytes:
+        """Devolve o tabuleiro codificado em bytes (ver Board.pack)."""
+        return pack_array(self.to_array())
+
+    @classmethod
+    def unpack(cls, data: bytes):
+        """Reconstrói um tabuleiro codificado com pack."""
+        return cls.from_matrix(unpack_array(data).tolist())
+
+    def __getstate__(self):
+        # A tabela de chaves de Zobrist é partilhada por todos os tabuleiros da
+        # mesma dimensão e não é guardada com cada um
+        return {name: getattr(self, name) for name in self.__slots__[:-1]}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.keys = zobrist_keys(self.dim)
+
+    def _count(self, ones: int, filled: int, val: int) -> int:
+        """Número de células com o valor 'val' numa fila."""
+        return ones.bit_count() if val == 1 else (filled & ~ones).bit_count()
+
+    def _triples_at(self, row: int, col: int) -> int:
+        """Número de sequências de três valores iguais seguidos que incluem a
+        célula (preenchida), na sua linha e na sua coluna."""
+        n = 0
+        for o, f, k in (
+            (self.row_ones[row], self.row_filled[row], col),
+            (self.col_ones[col], self.col_filled[col], row),
+        ):
+            for s in range(max(k - 2, 0), min(k, self.dim - 3) + 1):
+                m = 7 << s
+                n += f & m == m and o & m in (0, m)
+        return n
+
+    def set_number(self, row: int, col: int, val: int):
+        """Preenche a célula no próprio tabuleiro, sem o copiar."""
+        dim = self.dim
+        self.row_filled[row] |= 1 << col
+        self.col_filled[col] |= 1 << row
+        if val == 1:
+            self.row_ones[row] |= 1 << col
+            self.col_ones[col] |= 1 << row
+        self.triples += self._triples_at(row, col)
+        self.zobrist ^= self.keys[row][col][val]
+        self.empty_cells -= 1
+        maxc = (dim + 1) // 2
+        if self._count(self.row_ones[row], self.row_filled[row], val) == maxc + 1:
+            self.overfull += 1
+        if self._count(self.col_ones[col], self.col_filled[col], val) == maxc + 1:
+            self.overfull += 1
+        full = (1 << dim) - 1
+        if self.row_filled[row] == full:
+            update_lines(self.complete_rows, self.row_ones[row], 1)
+        if self.col_filled[col] == full:
+            update_lines(self.complete_cols, self.col_ones[col], 1)
+
+    def clear_number(self, row: int, col: int):
+        """Esvazia uma célula preenchida com set_number."""
+        dim = self.dim
+        val = self.get_number(row, col)
+        full = (1 << dim) - 1
+        if self.row_filled[row] == full:
+            update_lines(self.complete_rows, self.row_ones[row], -1)
+        if self.col_filled[col] == full:
+            update_lines(self.complete_cols, self.col_ones[col], -1)
+        maxc = (dim + 1) // 2
+        if self._count(self.row_ones[row], self.row_filled[row], val) == maxc + 1:
+            self.overfull -= 1
+        if self._count(self.col_ones[col], self.col_filled[col], val) == maxc + 1:
+            self.overfull -= 1
+        self.triples -= self._triples_at(row, col)
+        self.zobrist ^= self.keys[row][col][val]
+        self.empty_cells += 1
+        self.row_filled[row] &= ~(1 << col)
+        self.col_filled[col] &= ~(1 << row)
+        self.row_ones[row] &= ~(1 << col)
+        self.col_ones[col] &= ~(1 << row)
+
+
+def assignments(action) -> tuple:
+    """Devolve as atribuições (linha, coluna, valor) de uma ação, que pode ser
+    uma única atribuição ou um lote resultante da propagação."""
+    return action if isinstance(action[0], tuple) else (action,)
+
+
+def line_deductions(line: list, dim: int):
+    """Devolve a lista de pares (posição, valor) forçados numa fila pelas regras
+    do jogo (equilíbrio de 0's e 1's, pares e intercalados), ou None se a fila
+    já não puder ser completada."""
+    maxc = (dim + 1) // 2
+    zeros = line.count(0)
+    ones = line.count(1)
+    if zeros > maxc or ones > maxc:
+        return None
+    forced = []
+    for k in range(dim):
+        if line[k] != 2:
+            # Três valores iguais seguidos
+            if k >= 2 and line[k] == line[k - 1] == line[k - 2]:
+                return None
+            continue
+        # Se um dos números já está maximizado, as restantes células têm o outro
+        v = 1 if zeros == maxc else (0 if ones == maxc else None)
+        for a, b in ((k - 2, k - 1), (k + 1, k + 2), (k - 1, k + 1)):
+            if 0 <= a and b < dim and line[a] == line[b] != 2:
+                w = 1 - line[a]
+                # A célula teria de ter os dois valores
+                if v is not None and v != w:
+                    return None
+                v = w
+        if v is not None:
+            forced.append((k, v))
+    return forced
+
+
+def unique_deductions(line: list, dim: int, complete: dict):
+    """Para uma fila com no máximo duas células vazias, devolve a lista de pares
+    (posição, valor) comuns a todas as formas válidas de a completar que não
+    repitam uma fila completa paralela ('complete'), ou None se não houver
+    nenhuma."""
+    empty = [k for k in range(dim) if line[k] == 2]
+    completions = []
+    for values in itertools.product((0, 1), repeat=len(empty)):
+        full = list(line)
+        for k, v in zip(empty, values):
+            full[k] = v
+        completions.append((values, full))
+    # Se nenhuma forma de completar a fila repete outra, a regra não se aplica
+    if all(tuple(full) not in complete for _, full in completions):
+        return []
+    candidates = [
+        values
+        for values, full in completions
+        if tuple(full) not in complete and line_deductions(full, dim) is not None
+    ]
+    if not candidates:
+        return None
+    forced = []
+    for n, k in enumerate(empty):
+        if all(c[n] == candidates[0][n] for c in candidates):
+            forced.append((k, candidates[0][n]))
+    return forced
+
+
+def propagate(grid: list, dim: int, unique=True, stats=None, index=None):
+    """Aplica line_deductions às linhas e colunas até não haver alterações e,
+    se 'unique' for verdadeiro, também a regra das filas distintas às filas a
+    uma ou duas células de estarem completas. Se for dado um índice de padrões
+    ('index'), as células com o mesmo valor em todas as formas válidas de
+    completar a fila (que não repitam uma fila completa) também são forçadas,
+    o que inclui a regra das filas distintas. Altera 'grid' (lista de listas) e
+    devolve a lista de atribuições (linha, coluna, valor) feitas, ou None se
+    encontrar uma contradição. As regras aplicadas são contadas em 'stats'."""
+    if stats is None:
+        stats = collections.Counter()
+    res = []
+    # Filas por analisar e filas completas (valores -> índice), para linhas e colunas
+    dirty = (set(range(dim)), set(range(dim)))
+    complete = ({}, {})
+    # Máscaras dos 1's das filas completas, a excluir do índice de padrões
+    complete_ones = ([], [])
+    empty = (
+        [row.count(2) for row in grid],
+        [[grid[i][j] for i in range(dim)].count(2) for j in range(dim)],
+    )
+    while dirty[0] or dirty[1]:
+        d = 0 if dirty[0] else 1
+        k = dirty[d].pop()
+        line = grid[k] if d == 0 else [grid[i][k] for i in range(dim)]
+        forced = line_deductions(line, dim)
+        if forced is None:
+            stats["pruned"] += 1
+            return None
+        stats["propagated"] += len(forced)
+        if unique and not forced and empty[d][k] == 0:
+            # Fila completa: não pode ser igual a outra fila completa paralela
+            t = tuple(line)
+            if t not in complete[d]:
+                complete[d][t] = k
+                complete_ones[d].append(line_masks(t)[1])
+                # Nova fila completa: rever as filas paralelas quase completas
+                # ou, com o índice de padrões (que a exclui das completações de
+                # filas com qualquer número de células vazias), todas as
+                # incompletas
+                for m in range(dim):
+                    if 0 < empty[d][m] <= (dim if index is not None else 2):
+                        dirty[d].add(m)
+            elif complete[d][t] != k:
+                stats["unique_pruned"] += 1
+                return None
+        elif index is not None and not forced and empty[d][k] > 0:
+            forced = index.forced(line, complete_ones[d])
+            if forced is None:
+                stats["pattern_pruned"] += 1
+                return None
+            stats["pattern_forced"] += len(forced)
+        elif unique and not forced and empty[d][k] <= 2 and complete[d]:
+            forced = unique_deductions(line, dim, complete[d])
+            if forced is None:
+                stats["unique_pruned"] += 1
+                return None
+            stats["unique_forced"] += len(forced)
+        for m, v in forced:
+            i, j = (k, m) if d == 0 else (m, k)
+            grid[i][j] = v
+            res.append((i, j, v))
+            empty[0][i] -= 1
+            empty[1][j] -= 1
+            dirty[1 - d].add(m)
+        if forced:
+            dirty[d].add(k)
+    return res
+
+
+def pair_masks(a):
+    """Para um tabuleiro 'a' (array int8), devolve duas listas indexadas pelo
+    valor v: as máscaras das células ao lado de um par de v's (regra 02) e das
+    células entre dois v's (regra 03), obtidas comparando fatias deslocadas."""
+    pairs = []
+    sandwiches = []
+    for v in (0, 1):
+        eq = a == v
+        p = np.zeros_like(eq)
+        s = np.zeros_like(eq)
+        # Pares horizontais (j, j + 1) e verticais (i, i + 1)
+        h = eq[:, :-1] & eq[:, 1:]
+        p[:, 2:] |= h[:, :-1]
+        p[:, :-2] |= h[:, 1:]
+        w = eq[:-1, :] & eq[1:, :]
+        p[2:, :] |= w[:-1, :]
+        p[:-2, :] |= w[1:, :]
+        s[:, 1:-1] |= eq[:, :-2] & eq[:, 2:]
+        s[1:-1, :] |= eq[:-2, :] & eq[2:, :]
+        pairs.append(p)
+        sandwiches.append(s)
+    return pairs, sandwiches
+
+
+def vectorized_deductions(a):
+    """Versão vetorizada de line_deductions para todas as filas de uma só vez.
+    Devolve os arrays (linhas, colunas, valores) das células forçadas pelas
+    regras de equilíbrio, pares e intercalados, ou None se o tabuleiro já não
+    puder ser completado."""
+    dim = a.shape[0]
+    maxc = (dim + 1) // 2
+    empty = a == 2
+    cannot = []
+    for v in (0, 1):
+        eq = a == v
+        row_count = eq.sum(axis=1)
+        col_count = eq.sum(axis=0)
+        # Valores a mais ou três valores iguais seguidos
+        if (row_count > maxc).any() or (col_count > maxc).any():
+            return None
+        if (eq[:, :-2] & eq[:, 1:-1] & eq[:, 2:]).any():
+            return None
+        if (eq[:-2, :] & eq[1:-1, :] & eq[2:, :]).any():
+            return None
+        cannot.append((row_count == maxc)[:, None] | (col_count == maxc)[None, :])
+    pairs, sandwiches = pair_masks(a)
+    # Células que não podem ter 0 e células que não podem ter 1
+    no0 = empty & (cannot[0] | pairs[0] | sandwiches[0])
+    no1 = empty & (cannot[1] | pairs[1] | sandwiches[1])
+    if (no0 & no1).any():
+        return None
+    rows, cols = np.nonzero(no0 | no1)
+    return rows, cols, no0[rows, cols].astype(np.int8)
+
+
+def line_step(a, unique, stats, index=None):
+    """Aplica a um tabuleiro int8 as regras que exigem analisar cada fila como
+    um todo: a regra das filas distintas ('unique') e, se for dado um índice de
+    padrões ('index'), a procura de células com o mesmo valor em todas as formas
+    válidas de completar a fila. Trata primeiro as linhas e depois as colunas e
+    devolve as atribuições forçadas na primeira direção em que há alguma, ou
+    None se houver uma contradição."""
+    dim = a.shape[0]
+    for d, lines in enumerate((a, a.T)):
+        empty = (lines == 2).sum(axis=1)
+        complete = {}
+        if unique:
+            for k in np.flatnonzero(empty == 0).tolist():
+                t = tuple(lines[k].tolist())
+                if t in complete:
+                    stats["unique_pruned"] += 1
+                    return None
+                complete[t] = k
+        res = []
+        if index is not None:
+            exclude = [line_masks(t)[1] for t in complete]
+            for k in np.flatnonzero(empty > 0).tolist():
+                forced = index.forced(lines[k].tolist(), exclude)
+                if forced is None:
+                    stats["pattern_pruned"] += 1
+                    return None
+                stats["pattern_forced"] += len(forced)
+                res.extend((k, m, v) if d == 0 else (m, k, v) for m, v in forced)
+        elif complete:
+            for k in np.flatnonzero((empty > 0) & (empty <= 2)).tolist():
+                forced = unique_deductions(lines[k].tolist(), dim, complete)
+                if forced is None:
+                    stats["unique_pruned"] += 1
+                    return None
+                stats["unique_forced"] += len(forced)
+                res.extend((k, m, v) if d == 0 else (m, k, v) for m, v in forced)
+        if res:
+            return res
+    return []
+
+
+def propagate_vectorized(a, unique=True, stats=None, index=None):
+    """Versão vetorizada de propagate, que altera o tabuleiro 'a' (array int8).
+    Em cada iteração aplica todas as jogadas forçadas encontradas por
+    vectorized_deductions; só quando não há nenhuma recorre às regras que
+    analisam cada fila como um todo (line_step). Chega ao mesmo ponto fixo que
+    propagate."""
+    if stats is None:
+        stats = collections.Counter()
+    res = []
+    while True:
+        forced = vectorized_deductions(a)
+        if forced is None:
+            stats["pruned"] += 1
+            return None
+        rows, cols, vals = forced
+        if len(rows):
+            stats["propagated"] += len(rows)
+            a[rows, cols] = vals
+            res.extend(zip(rows.tolist(), cols.tolist(), vals.tolist()))
+            continue
+        if not unique and index is None:
+            return res
+        forced = line_step(a, unique, stats, index)
+        if forced is None:
+            return None
+        if not forced:
+            return res
+        for i, j, v in forced:
+            a[i, j] = v
+        res.extend(forced)
+
+
+def first_empty_cell(board: Board, index=None):
+    """Política de ramificação original: a primeira célula vazia, percorrendo
+    o tabuleiro linha a linha. Devolve None se não houver nenhuma."""
+    dim = board.dim
+    for i in range(dim):
+        for j in range(dim):
+            if board.get_number(i, j) == 2:
+                return i, j
+    return None
+
+
+def most_constrained_cell(board: Board, index=None):
+    """Política de ramificação pela célula mais restringida. Como as contagens
+    de cada fila são mantidas pelo tabuleiro a cada jogada, escolhe-se primeiro,
+    sem percorrer o tabuleiro, a linha ou coluna com menos células vazias (com
+    um índice de padrões, a que tem menos formas de ser completada, entre as
+    que têm até duas células vazias a mais do que a mínima). Dentro dela, a
+    célula cuja fila perpendicular está mais preenchida, desempatando pelo
+    número de vizinhas preenchidas. Devolve None se não houver células vazias."""
+    dim = board.dim
+    empty = (
+        [dim - sum(t) for t in board.row_tally],
+        [dim - sum(t) for t in board.col_tally],
+    )
+    lines = [(e, d, k) for d in (0, 1) for k, e in enumerate(empty[d]) if e]
+    if not lines:
+        return None
+    least = min(lines)[0]
+    if index is not None:
+        line = lambda d, k: board.get_row(k) if d == 0 else board.get_column(k)
+        lines = [
+            (len(index.completions(*line_masks(line(d, k)))), e, d, k)
+            for e, d, k in lines
+            if e <= least + 2
+        ]
+    d, k = min(lines)[-2:]
+    best = None
+    for m in range(dim):
+        i, j = (k, m) if d == 0 else (m, k)
+        if board.get_number(i, j) != 2:
+            continue
+        filled = sum(
+            n not in (2, None)
+            for n in board.adjacent_vertical_numbers(i, j)
+            + board.adjacent_horizontal_numbers(i, j)
+        )
+        score = (-empty[1 - d][m], -filled)
+        if best is None or score < best[0]:
+            best = (score, i, j)
+    return best[1:]
+
+
+# Políticas de escolha da célula onde ramificar: função (tabuleiro, índice de
+# padrões ou None) -> (linha, coluna) ou None
+BRANCHING = {"first": first_empty_cell, "constrained": most_constrained_cell}
 
 
 class Takuzu(Problem):
-    def __init__(self, board: Board):
-        """O construtor especifica o estado inicial."""
-        self.initial = TakuzuState(board, None)
+    def __init__(
+        self,
+        board: Board,
+        propagate=True,
+        unique=True,
+        rules="loop",
+        patterns=False,
+        probe=0,
+        branching="first",
+        snapshot=0,
+        arena=False,
+    ):
+        """O construtor especifica o estado inicial. Se 'propagate' for verdadeiro,
+        todas as jogadas forçadas são aplicadas de uma só vez (numa única ação)
+        antes de se escolher uma célula para ramificar. Se 'unique' também o for,
+        a propagação usa a regra das filas distintas. Com 'rules' igual a
+        "vectorized", as regras são avaliadas com operações NumPy sobre o
+        tabuleiro inteiro em vez de célula a célula. Se 'patterns' for verdadeiro,
+        a propagação usa também o índice de filas válidas (ver patterns.py), desde
+        que exista para a dimensão do tabuleiro. Antes de ramificar, são sondadas
+        até 'probe' células vazias (ver probe). A célula onde se ramifica é
+        escolhida pela política 'branching' (um nome de BRANCHING ou uma função
+        com a mesma assinatura). Se 'snapshot' for maior que 0, os estados só
+        guardam o tabuleiro a cada 'snapshot' níveis (ver TakuzuDeltaState). Se
+        'arena' for verdadeiro, os tabuleiros (Board) são alocados numa
+        BoardArena e as procuras devolvem-lhe os que já não são precisos (ver
+        release). O número de vezes que cada regra da propagação é aplicada fica
+        registado em 'stats'."""
+        self.arena = None
+        if arena:
+            if snapshot or not isinstance(board, Board):
+                raise ValueError("A arena só suporta Board, sem 'snapshot'")
+            self.arena = BoardArena(board.dim)
+            board = self.arena.board(board)
+        self.snapshot = snapshot
+        if snapshot:
+            self.initial = TakuzuDeltaState(board, None, every=snapshot)
+        else:
+            self.initial = TakuzuState(board, None)
+        self.propagate = propagate
+        self.unique = unique
+        self.rules = rules
+        self.index = get_index(board.dim) if patterns else None
+        self.probe_budget = probe
+        self.select_cell = (
+            BRANCHING[branching] if isinstance(branching, str) else branching
+        )
+        self.stats = collections.Counter()
+        # Valores de 'last' substituídos por do_action, repostos por undo_action
+        self.history = []
+
+    def propagate_board(self, board: Board, moves=(), stats=None):
+        """Aplica as jogadas 'moves' a uma cópia do tabuleiro e propaga-a com as
+        regras escolhidas. Devolve a lista de jogadas forçadas (sem 'moves') ou
+        None se houver uma contradição."""
+        if self.rules == "vectorized":
+            grid = board.to_array()
+            for i, j, v in moves:
+                grid[i, j] = v
+            return propagate_vectorized(grid, self.unique, stats, self.index)
+        grid = board.to_matrix()
+        for i, j, v in moves:
+            grid[i][j] = v
+        return propagate(grid, board.dim, self.unique, stats, self.index)
 
     def actions(self, state: TakuzuState):
         """Retorna uma lista de ações que podem ser executadas a
@@ -138,6 +1264,16 @@ class Takuzu(Problem):
         board = state.board
         dim = board.dim
 
+        # 00. Propagação: aplicar as regras 01 a 03 até não haver alterações,
+        # devolvendo todas as jogadas forçadas como uma única ação
+        if self.propagate:
+            forced = self.propagate_board(board, stats=self.stats)
+            if forced is None:
+                return []
+            if forced:
+                return [tuple(forced)]
+            return self.probe(state) if self.probe_budget else self.branch(state)
+
         def check_two_numbers(state: TakuzuState, l: int, c: int, v: int):
             """Retorna verdadeiro se for possível colocar "v"
             na célula com linha "l" e coluna "c", com base nos dois valores
@@ -239,8 +1375,29 @@ class Takuzu(Problem):
                         else:
                             return []
 
-        # 02. Caso em que temos 2 células consecutivas iguais
+        # 02. e 03. Versão vetorizada: encontrar a primeira célula vazia em que a
+        # regra se aplica e determinar o valor pela mesma ordem que os ciclos abaixo
         modes = ("previous", "following", "below", "above")
+        if self.rules == "vectorized":
+            a = board.to_array()
+            empty = a == 2
+            pairs, sandwiches = pair_masks(a)
+            cells = np.flatnonzero(empty & (pairs[0] | pairs[1]))
+            if len(cells):
+                i, j = divmod(int(cells[0]), dim)
+                for m in modes:
+                    t = board.two_numbers(i, j, m)
+                    if t == (0, 0):
+                        return [(i, j, 1)]
+                    elif t == (1, 1):
+                        return [(i, j, 0)]
+            cells = np.flatnonzero(empty & (sandwiches[0] | sandwiches[1]))
+            if len(cells):
+                i, j = divmod(int(cells[0]), dim)
+                return [(i, j, 1 if sandwiches[0][i, j] else 0)]
+            return self.probe(state) if self.probe_budget else self.branch(state)
+
+        # 02. Caso em que temos 2 células consecutivas iguais
         for i in range(dim):
             for j in range(dim):
                 if board.get_number(i, j) == 2:
@@ -263,30 +1420,114 @@ class Takuzu(Problem):
                     if h == (1, 1) or v == (1, 1):
                         return [(i, j, 0)]
 
-        # 04. Caso em que nada sabemos e damos prioridade ao número menos presente na linha e coluna
-        res = []
+        return self.probe(state) if self.probe_budget else self.branch(state)
+
+    def probe(self, state: TakuzuState):
+        """Sondagem antes de ramificar: para até 'probe_budget' células vazias,
+        começando pelas que têm mais vizinhas preenchidas, experimenta cada valor
+        e propaga. Se um dos valores levar a uma contradição, a célula fica com o
+        outro e devolve-se essa jogada, com as que ela força, como uma única ação
+        (um ramo a menos). Se ambos levarem, o estado não tem solução. Caso
+        contrário, ramifica como em branch."""
+        board = state.board
+        dim = board.dim
+        cells = []
         for i in range(dim):
             for j in range(dim):
                 if board.get_number(i, j) == 2:
-                    if (row_t[i][0] > row_t[i][1] and col_t[j][0] >= col_t[j][1]) or (
-                        row_t[i][0] >= row_t[i][1] and col_t[j][0] > col_t[j][1]
-                    ):
-                        return [(i, j, 1), (i, j, 0)]
-                    elif (row_t[i][0] < row_t[i][1] and col_t[j][0] <= col_t[j][1]) or (
-                        row_t[i][0] <= row_t[i][1] and col_t[j][0] < col_t[j][1]
-                    ):
-                        return [(i, j, 0), (i, j, 1)]
-                    else:
-                        return [(i, j, 0), (i, j, 1)]
-        return res
+                    filled = sum(
+                        n not in (2, None)
+                        for n in board.adjacent_vertical_numbers(i, j)
+                        + board.adjacent_horizontal_numbers(i, j)
+                    )
+                    cells.append((-filled, i, j))
+        cells.sort()
+        for filled, i, j in cells[: self.probe_budget]:
+            outcomes = []
+            for v in (0, 1):
+                self.stats["probes"] += 1
+                outcomes.append(self.propagate_board(board, ((i, j, v),)))
+            if outcomes[0] is None and outcomes[1] is None:
+                self.stats["probe_pruned"] += 1
+                return []
+            for v in (0, 1):
+                if outcomes[1 - v] is None:
+                    self.stats["probe_forced"] += 1
+                    return [((i, j, v),) + tuple(outcomes[v])]
+        return self.branch(state)
+
+    def branch(self, state: TakuzuState):
+        """Retorna as duas ações possíveis para a célula escolhida pela política
+        de ramificação, quando não há nenhuma jogada forçada."""
+        board = state.board
+        row_t = board.row_tally
+        col_t = board.col_tally
+
+        # 04. Caso em que nada sabemos e damos prioridade ao número menos presente na linha e coluna
+        cell = self.select_cell(board, self.index)
+        if cell is None:
+            return []
+        i, j = cell
+        if (row_t[i][0] > row_t[i][1] and col_t[j][0] >= col_t[j][1]) or (
+            row_t[i][0] >= row_t[i][1] and col_t[j][0] > col_t[j][1]
+        ):
+            return [(i, j, 1), (i, j, 0)]
+        elif (row_t[i][0] < row_t[i][1] and col_t[j][0] <= col_t[j][1]) or (
+            row_t[i][0] <= row_t[i][1] and col_t[j][0] < col_t[j][1]
+        ):
+            return [(i, j, 0), (i, j, 1)]
+        else:
+            return [(i, j, 0), (i, j, 1)]
 
     def result(self, state: TakuzuState, action):
         """Retorna o estado resultante de executar a 'action' sobre
         'state' passado como argumento. A ação a executar deve ser uma
         das presentes na lista obtida pela execução de
         self.actions(state)."""
-        board = state.board.apply_action(action)
-        return TakuzuState(board, action)
+        if isinstance(action[0], tuple):
+            board = state.board.apply_actions(action)
+            last = action[-1]
+        else:
+            board = state.board.apply_action(action)
+            last = action
+        if self.snapshot:
+            return TakuzuDeltaState(board, last, state, action, self.snapshot)
+        return TakuzuState(board, last)
+
+    def pack_state(self, state: TakuzuState) -> PackedState:
+        """Devolve o tabuleiro do estado codificado em bytes (ver Board.pack),
+        com o id do estado para manter a ordem entre estados."""
+        return PackedState(state.board.pack(), state.id)
+
+    def unpack_state(self, packed: PackedState):
+        """Reconstrói um estado a partir do tabuleiro codificado, com o mesmo
+        tipo de tabuleiro do estado inicial."""
+        board = type(self.initial.board).unpack(packed.data)
+        if self.arena is not None:
+            board = self.arena.board(board)
+        if self.snapshot:
+            return TakuzuDeltaState(board, None, every=self.snapshot)
+        return TakuzuState(board, None)
+
+    def release(self, state: TakuzuState):
+        """Devolve à arena o tabuleiro do estado, se houver arena."""
+        if self.arena is not None:
+            state.board.release()
+
+    def do_action(self, state: TakuzuState, action):
+        """Executa a 'action' sobre o próprio 'state', sem copiar o tabuleiro.
+        Usado pela procura DFS com desfazer (depth_first_trail_search)."""
+        self.history.append(state.last)
+        for a in assignments(action):
+            state.board.set_number(*a)
+        state.last = a
+
+    def undo_action(self, state: TakuzuState, action):
+        """Desfaz uma ação executada com do_action, repondo também a última
+        jogada do estado."""
+        for a in reversed(assignments(action)):
+            state.board.clear_number(a[0], a[1])
+        state.last = self.history.pop()
 
     def goal_test(self, state: TakuzuState):
         """Retorna True se e só se o estado passado como argumento é
@@ -294,32 +1535,18 @@ class Takuzu(Problem):
         estão preenchidas com uma sequência de números adjacentes."""
 
         board = state.board
-        row_t = board.row_tally
-        col_t = board.col_tally
         dim = board.dim
-        # Se a soma de 0's e 1's para cada linha é menor que a dimensão do
-        # tabuleiro, então o tabuleiro ainda tem células vazias
-        for i in range(dim):
-            if sum(row_t[i]) != dim:
-                return False
-        rows = set()
-        cols = set()
-        for i in range(dim):
-            r = board.get_row(i)
-            c = board.get_column(i)
-            if r in rows or c in cols:
-                return False
-            else:
-                if (
-                    row_t[i][0] >= dim / 2 + 1
-                    or row_t[i][1] >= dim / 2 + 1
-                    or col_t[i][0] >= dim / 2 + 1
-                    or col_t[i][1] >= dim / 2 + 1
-                ):
-                    return False
-                rows.add(r)
-                cols.add(c)
-        return True
+        # As filas completas e o número de células vazias são mantidos pelo
+        # tabuleiro a cada jogada: está resolvido se não houver células vazias,
+        # nenhuma fila tiver valores a mais nem três valores iguais seguidos e
+        # as filas completas forem distintas
+        return (
+            board.empty_cells == 0
+            and board.overfull == 0
+            and board.triples == 0
+            and len(board.complete_rows) == dim
+            and len(board.complete_cols) == dim
+        )
 
     def h(self, node: Node):
         """Função heuristica utilizada para as procuras Greedy e A*."""
@@ -347,19 +1574,716 @@ class Takuzu(Problem):
         """
 
 
-if __name__ == "__main__":  # Função main
+class TakuzuDomainsState(TakuzuState):
+    """Estado do TakuzuDomains: em vez de um tabuleiro, guarda para cada linha e
+    coluna o domínio das filas completas que ainda são possíveis, como arrays de
+    máscaras dos 1's (ver patterns.py). O tabuleiro é obtido a partir dos
+    domínios, com as células em que todas as filas possíveis coincidem."""
 
-    # Resolução do problema
-    board = Board.parse_instance_from_stdin()
+    __slots__ = ("dim", "rows", "cols", "history", "_board")
+
+    def __init__(self, dim, rows, cols, last):
+        self.dim = dim
+        # Listas de arrays de uint64; None se o estado não tiver solução
+        self.rows = rows
+        self.cols = cols
+        self.id = TakuzuState.state_id
+        self.last = last
+        self.history = []
+        self._board = None
+        TakuzuState.state_id += 1
+
+    @property
+    def board(self):
+        if self._board is None:
+            full = (1 << self.dim) - 1
+            mat = []
+            for dom in self.rows or ():
+                ones = int(np.bitwise_and.reduce(dom)) if len(dom) else 0
+                zeros = ~int(np.bitwise_or.reduce(dom)) & full if len(dom) else 0
+                mat.append(
+                    [
+                        1 if (ones >> k) & 1 else (0 if (zeros >> k) & 1 else 2)
+                        for k in range(self.dim)
+                    ]
+                )
+            self._board = Board.from_matrix(mat)
+        return self._board
+
+
+class TakuzuDomains(Takuzu):
+    """Variante do Takuzu em que cada linha e coluna tem um domínio de filas
+    completas possíveis. Os domínios são filtrados alternadamente (as células em
+    que todas as filas possíveis de uma linha coincidem restringem as colunas, e
+    vice-versa) até não haver alterações, e as filas já determinadas são
+    retiradas dos domínios paralelos. As ações fixam o valor de uma célula da
+    fila com menor domínio, pelo que as procuras de search.py continuam a
+    decidir a ramificação. Requer o índice de filas válidas (dimensão até
+    MAX_DIM)."""
+
+    def __init__(self, board: Board, unique=True):
+        # Os atributos herdados do Takuzu ficam todos definidos (sem arena nem
+        # snapshots); o estado inicial é depois substituído pelo dos domínios
+        super().__init__(board, unique=unique, patterns=True)
+        dim = board.dim
+        self.dim = dim
+        self.full = (1 << dim) - 1
+        if self.index is None:
+            raise ValueError("Não há tabela de filas para dimensão {}".format(dim))
+        rows = [
+            self.index.completions(*line_masks(board.get_row(i))) for i in range(dim)
+        ]
+        cols = [
+            self.index.completions(*line_masks(board.get_column(j))) for j in range(dim)
+        ]
+        self.initial = TakuzuDomainsState(dim, *self.revise(rows, cols), None)
+
+    def known(self, dom) -> tuple:
+        """Devolve as máscaras das posições que são 1, e que são 0, em todas as
+        filas de um domínio."""
+        ones = int(np.bitwise_and.reduce(dom))
+        zeros = ~int(np.bitwise_or.reduce(dom)) & self.full
+        return ones, zeros
+
+    def revise(self, rows, cols, changed=None):
+        """Filtra os domínios até não haver alterações. Devolve as novas listas de
+        domínios (os arrays que não mudam são partilhados) ou (None, None) se
+        algum ficar vazio. 'changed' indica as filas (direção, índice) alteradas
+        desde a última filtragem; por omissão, todas."""
+        dim = self.dim
+        lines = (list(rows), list(cols))
+        if changed is None:
+            changed = {(d, k) for d in (0, 1) for k in range(dim)}
+        # Número de filas determinadas em cada direção na última verificação
+        determined = [-1, -1]
+        while changed:
+            # Células conhecidas a partir das filas alteradas, para as filas da
+            # outra direção: (máscara, valores) indexados pela fila de destino
+            targets = ({}, {})
+            for d, k in changed:
+                dom = lines[d][k]
+                if not len(dom):
+                    self.stats["pruned"] += 1
+                    return None, None
+                ones, zeros = self.known(dom)
+                t = targets[1 - d]
+                for m in range(dim):
+                    if (ones >> m) & 1 or (zeros >> m) & 1:
+                        mask, values = t.get(m, (0, 0))
+                        t[m] = (mask | 1 << k, values | ((ones >> m) & 1) << k)
+            changed = set()
+            for d in (0, 1):
+                for m, (mask, values) in targets[d].items():
+                    dom = lines[d][m]
+                    new = dom[(dom & np.uint64(mask)) == np.uint64(values)]
+                    if len(new) != len(dom):
+                        self.stats["revised"] += len(dom) - len(new)
+                        lines[d][m] = new
+                        changed.add((d, m))
+            if self.unique:
+                for d in (0, 1):
+                    singles = [int(dom[0]) for dom in lines[d] if len(dom) == 1]
+                    if len(singles) == determined[d]:
+                        continue
+                    determined[d] = len(singles)
+                    # Filas determinadas repetidas
+                    if len(set(singles)) != len(singles):
+                        self.stats["unique_pruned"] += 1
+                        return None, None
+                    used = np.array(singles, dtype=np.uint64)
+                    for m, dom in enumerate(lines[d]):
+                        if len(dom) > 1:
+                            new = dom[~np.isin(dom, used)]
+                            if len(new) != len(dom):
+                                self.stats["unique_revised"] += len(dom) - len(new)
+                                lines[d][m] = new
+                                changed.add((d, m))
+        return lines
+
+    def actions(self, state: TakuzuDomainsState):
+        """Retorna as duas ações possíveis para uma célula ainda por decidir da
+        fila com menor domínio, começando pelo valor menos frequente nas filas
+        possíveis (a procura DFS explora primeiro a última ação)."""
+        if state.rows is None:
+            return []
+        best = None
+        for d, lines in enumerate((state.rows, state.cols)):
+            for k, dom in enumerate(lines):
+                if len(dom) > 1 and (best is None or len(dom) < best[0]):
+                    best = (len(dom), d, k)
+        if best is None:
+            return []
+        n, d, k = best
+        dom = (state.rows, state.cols)[d][k]
+        ones, zeros = self.known(dom)
+        m = next(m for m in range(self.dim) if not ((ones | zeros) >> m) & 1)
+        c1 = int(np.count_nonzero((dom >> np.uint64(m)) & np.uint64(1)))
+        i, j = (k, m) if d == 0 else (m, k)
+        self.stats["branches"] += 1
+        return [(i, j, 0), (i, j, 1)] if c1 >= n - c1 else [(i, j, 1), (i, j, 0)]
+
+    def restrict(self, state: TakuzuDomainsState, action) -> tuple:
+        """Devolve os domínios de 'state' depois de fixar a célula da ação."""
+        i, j, v = action
+        rows, cols = list(state.rows), list(state.cols)
+        rows[i] = rows[i][((rows[i] >> np.uint64(j)) & np.uint64(1)) == v]
+        cols[j] = cols[j][((cols[j] >> np.uint64(i)) & np.uint64(1)) == v]
+        return self.revise(rows, cols, {(0, i), (1, j)})
+
+    def result(self, state: TakuzuDomainsState, action):
+        return TakuzuDomainsState(self.dim, *self.restrict(state, action), action)
+
+    def do_action(self, state: TakuzuDomainsState, action):
+        state.history.append((state.rows, state.cols, state.last))
+        state.rows, state.cols = self.restrict(state, action)
+        state.last = action
+        state._board = None
+
+    def undo_action(self, state: TakuzuDomainsState, action):
+        state.rows, state.cols, state.last = state.history.pop()
+        state._board = None
+
+    def goal_test(self, state: TakuzuDomainsState):
+        """Está resolvido quando todas as filas têm uma única possibilidade, que
+        é consistente com as filas da outra direção, e não há filas repetidas."""
+        if state.rows is None:
+            return False
+        for lines in (state.rows, state.cols):
+            if any(len(dom) != 1 for dom in lines):
+                return False
+            if len({int(dom[0]) for dom in lines}) != self.dim:
+                return False
+        return True
+
+    # Os domínios não podem ser obtidos a partir do tabuleiro: os estados são
+    # guardados tal como estão
+    pack_state = Problem.pack_state
+    unpack_state = Problem.unpack_state
+
+    def h(self, node: Node):
+        """Fração das células ainda por decidir (infinito se o estado não tiver
+        solução)."""
+        if node.state.rows is None:
+            return float("inf")
+        board = node.state.board
+        return board.empty_cells / board.dim**2
+
+
+BACKENDS = {"array": Board, "bitboard": BitBoard}
+
+
+# Procuras disponíveis: função (problema, tabela de transposição ou None) -> nó
+# objetivo. A procura Greedy já guarda os estados explorados e ignora a tabela;
+# aceita ainda 'pack', para guardar os tabuleiros da fronteira codificados. A
+# DFS paralela aceita o número de processos (por omissão, um por processador).
+SEARCHES = {
+    "dfs": depth_first_tree_search,
+    "lazy": depth_first_lazy_search,
+    "trail": depth_first_trail_search,
+    "parallel": depth_first_parallel_search,
+    "greedy": lambda problem, table=None, pack=False, queue=IndexedPriorityQueue: (
+        greedy_search(problem, problem.h, pack, queue)
+    ),
+}
+
+
+def solve(
+    problem: Takuzu,
+    search="auto",
+    table=None,
+    pack=False,
+    queue=IndexedPriorityQueue,
+    workers=None,
+):
+    """Resolve o problema com a procura indicada. Por omissão ("auto"), aplica a
+    procura Greedy se menos de metade das células do tabuleiro inicial estiverem
+    preenchidas e a procura DFS caso contrário. Se for dada uma tabela de
+    transposição ('table'), as procuras em profundidade guardam nela os estados
+    sem solução. Com 'pack', a procura Greedy guarda os tabuleiros da fronteira
+    e dos estados explorados codificados em bytes; 'queue' é a classe da sua
+    fronteira. A procura "parallel" usa 'workers' processos."""
+    if search == "greedy":
+        return SEARCHES[search](problem, table, pack, queue)
+    if search == "parallel":
+        return SEARCHES[search](problem, table, workers)
+    if search != "auto":
+        return SEARCHES[search](problem, table)
+    board = problem.initial.board
     dim = board.dim
-    problem = Takuzu(board)
-    c = 0
-    for i in range(dim):
-        c += sum(board.row_tally[i])
+    c = dim**2 - board.empty_cells
     # Se o número de células preenchidas < metade, aplicar Greedy
     if c < (dim**2) / 2:
-        goal_node = greedy_search(problem, problem.h)
-    # Caso contrário, aplicar a procura DFS
+        return SEARCHES["greedy"](problem, table, pack, queue)
+    # Caso contrário, aplicar a procura DFS, expandindo os nós só quando são
+    # explorados (visita os mesmos nós que a DFS com lista de filhos)
+    else:
+        return SEARCHES["lazy"](problem, table)
+
+
+def solve_args(board, args, workers=None):
+    """Resolve o tabuleiro com as opções da linha de comandos 'args' e devolve
+    o nó objetivo (ou None). A procura "parallel" usa 'workers' processos e a
+    procura "portfolio" corre as estratégias de 'args.portfolio' em paralelo."""
+    if args.search == "portfolio":
+        return solve_portfolio(board, args)[0]
+    if args.domains:
+        problem = TakuzuDomains(board, args.unique)
+    else:
+        problem = Takuzu(
+            board,
+            args.propagate,
+            args.unique,
+            args.rules,
+            args.patterns,
+            args.probe,
+            args.branching,
+            args.snapshot,
+            args.arena,
+        )
+    table = None
+    if args.tt and args.tt_shared:
+        table = SharedTranspositionTable(args.tt)
+    elif args.tt:
+        table = TranspositionTable(args.tt, args.tt_policy)
+    queue = IndexedPriorityQueue
+    if args.spill:
+        # Os nós pais ficam em memória, referidos pelos nós escritos em disco
+        queue = functools.partial(
+            SpillingPriorityQueue, capacity=args.spill, shared=(Node,)
+        )
+    return solve(problem, args.search, table, args.pack, queue, workers)
+
+
+# Estratégias que a procura "portfolio" pode pôr a competir, com as opções da
+# linha de comandos que cada uma substitui
+PORTFOLIO = {
+    "greedy": {"search": "greedy", "domains": False},
+    "dfs": {"search": "dfs", "domains": False, "propagate": False},
+    "propagate": {"search": "lazy", "domains": False, "propagate": True},
+    "domains": {"search": "lazy", "domains": True},
+}
+
+
+def _portfolio_worker(name, board, args, conn):
+    """Processo de uma estratégia de solve_portfolio: resolve o tabuleiro com as
+    opções da estratégia e envia o resultado por 'conn'."""
+    options = argparse.Namespace(**{**vars(args), **PORTFOLIO[name]})
+    try:
+        goal_node = solve_args(board, options)
+        if goal_node is None:
+            conn.send(("sem solução", None))
+        else:
+            conn.send(("ok", goal_node.state.board))
+    except Exception as e:
+        conn.send(("erro", repr(e)))
+
+
+def solve_portfolio(board, args) -> tuple:
+    """Resolve o tabuleiro com as estratégias 'args.portfolio' de PORTFOLIO ao
+    mesmo tempo, cada uma num processo, e devolve o par (nó objetivo ou None,
+    nome da estratégia vencedora) da primeira que terminar, terminando as
+    restantes. As estratégias que falham são ignoradas, a não ser que falhem
+    todas. Com 'args.portfolio_log', acrescenta a esse ficheiro uma linha com a
+    dimensão, as células preenchidas, a estratégia vencedora e o tempo."""
+    context = multiprocessing.get_context("fork")
+    start = time.perf_counter()
+    readers = {}  # ligação -> (estratégia, processo)
+    for name in args.portfolio:
+        reader, writer = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_portfolio_worker, args=(name, board, args, writer)
+        )
+        process.start()
+        writer.close()
+        readers[reader] = (name, process)
+    processes = [process for name, process in readers.values()]
+    errors = []
+    winner = None
+    try:
+        while readers and winner is None:
+            for reader in multiprocessing.connection.wait(list(readers)):
+                name, process = readers.pop(reader)
+                try:
+                    status, data = reader.recv()
+                except EOFError:
+                    status, data = "erro", "o processo terminou"
+                if status == "erro":
+                    errors.append("{}: {}".format(name, data))
+                else:
+                    winner = name
+                    break
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+    if winner is None:
+        raise RuntimeError("Todas as estratégias falharam: " + "; ".join(errors))
+    elapsed = time.perf_counter() - start
+    if args.portfolio_log:
+        with open(args.portfolio_log, "a") as f:
+            f.write(
+                "{}\t{}\t{}\t{:.1f}\n".format(
+                    board.dim,
+                    board.dim**2 - board.empty_cells,
+                    winner,
+                    elapsed * 1e3,
+                )
+            )
+    if status == "sem solução":
+        return None, winner
+    return Node(TakuzuState(data, None)), winner
+
+
+class PuzzleTimeout(Exception):
+    """Lançada quando um tabuleiro demora mais do que o tempo limite."""
+
+
+def _timeout(signum, frame):
+    raise PuzzleTimeout()
+
+
+def solve_puzzle(mat, args) -> tuple:
+    """Resolve um tabuleiro (lista de listas) com as opções 'args' e devolve o
+    par (resultado, texto): "ok" e a solução, "sem solução", "tempo esgotado"
+    se demorar mais de 'args.timeout' segundos, ou "erro" e a exceção, para
+    que um tabuleiro não interrompa a resolução dos restantes."""
+    if args.timeout:
+        signal.signal(signal.SIGALRM, _timeout)
+        signal.setitimer(signal.ITIMER_REAL, args.timeout)
+    try:
+        goal_node = solve_args(BACKENDS[args.backend].from_matrix(mat), args)
+        if goal_node is None:
+            return "sem solução", None
+        return "ok", str(goal_node.state.board)
+    except PuzzleTimeout:
+        return "tempo esgotado", None
+    except Exception as e:
+        return "erro", repr(e)
+    finally:
+        if args.timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def solve_sequential(puzzles, args):
+    """Resolve os triplos (índice, nome, tabuleiro) de 'puzzles' um a um e
+    devolve, pela mesma ordem, os quíntuplos (índice, resultado, texto, tempo
+    em segundos)."""
+    for index, name, mat in puzzles:
+        start = time.perf_counter()
+        status, text = solve_puzzle(mat, args)
+        yield index, status, text, time.perf_counter() - start
+
+
+# Opções da linha de comandos nos processos de um solve_parallel
+_worker_args = None
+
+
+def _init_worker(args):
+    global _worker_args
+    _worker_args = args
+    # As tabelas (chaves de Zobrist, índices de padrões) são construídas na
+    # primeira utilização e ficam no processo para os blocos seguintes
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _solve_chunk(chunk):
+    return list(solve_sequential(chunk, _worker_args))
+
+
+def solve_parallel(puzzles, args):
+    """Como solve_sequential, mas distribui os tabuleiros em blocos de
+    'args.chunk' por 'args.workers' processos e devolve os resultados à medida
+    que os blocos terminam. Se um processo terminar abruptamente, o conjunto de
+    processos é recriado e os tabuleiros dos blocos em curso voltam a ser
+    resolvidos, um de cada vez, para encontrar o responsável, que fica com o
+    resultado "erro"."""
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    from concurrent.futures.process import BrokenProcessPool
+
+    def executor():
+        return ProcessPoolExecutor(args.workers, None, _init_worker, (args,))
+
+    chunks = iter(lambda: list(itertools.islice(puzzles, args.chunk)), [])
+    pool = executor()
+    pending = {}  # futuro -> bloco
+    isolate = collections.deque()  # tabuleiros a resolver sozinhos
+    try:
+        while True:
+            if isolate:
+                if not pending:
+                    item = isolate.popleft()
+                    pending[pool.submit(_solve_chunk, [item])] = [item]
+            else:
+                # Manter alguns blocos em espera por processo
+                while len(pending) < 2 * args.workers:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    pending[pool.submit(_solve_chunk, chunk)] = chunk
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            # Um tabuleiro que estava sozinho em curso quando o conjunto de
+            # processos falhou é o responsável, haja ou não outros por isolar
+            alone = len(pending) == 1
+            broken = False
+            for future in done:
+                chunk = pending.pop(future)
+                try:
+                    yield from future.result()
+                except BrokenProcessPool:
+                    if len(chunk) == 1 and alone:
+                        index, name, mat = chunk[0]
+                        yield index, "erro", "o processo terminou", 0.0
+                    else:
+                        isolate.extend(chunk)
+                    broken = True
+            if broken:
+                for chunk in pending.values():
+                    isolate.extend(chunk)
+                pending.clear()
+                pool.shutdown(cancel_futures=True)
+                pool = executor()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def solve_batch(puzzles, args, out=sys.stdout, log=sys.stderr):
+    """Resolve os pares (nome, tabuleiro) de 'puzzles', num só processo ou em
+    'args.workers' processos, e escreve as soluções em 'out' pela mesma ordem
+    (ou, com 'args.unordered', à medida que terminam, cada uma depois de uma
+    linha com o nome do tabuleiro). Os tabuleiros sem solução ou que falham
+    são indicados pelo resultado ("sem solução", "tempo esgotado" ou "erro").
+    Em 'log' escreve o tempo de cada tabuleiro e, no fim, o débito total."""
+    names = {}
+
+    def numbered():
+        for index, (name, mat) in enumerate(puzzles):
+            names[index] = (name, len(mat))
+            yield index, name, mat
+
+    if args.workers and args.workers > 1:
+        results = solve_parallel(numbered(), args)
+    else:
+        results = solve_sequential(numbered(), args)
+    latencies = []
+    waiting = {}  # índice -> resultado que ainda não pode ser escrito
+    start = time.perf_counter()
+    for index, status, text, latency in results:
+        waiting[index] = (status, text, latency)
+        while waiting:
+            if args.unordered:
+                index = next(iter(waiting))
+            elif len(latencies) not in waiting:
+                break
+            else:
+                index = len(latencies)
+            status, text, latency = waiting.pop(index)
+            name, dim = names.pop(index)
+            if args.unordered:
+                print(name, file=out)
+            print(text if status == "ok" else status, file=out)
+            out.flush()
+            latencies.append(latency)
+            line = "{}\t{}\t{:.1f} ms".format(name, dim, latency * 1e3)
+            if status != "ok":
+                line += "\t" + (status if text is None else text)
+            print(line, file=log)
+    elapsed = time.perf_counter() - start
+    if latencies:
+        print(
+            "{} tabuleiros em {:.2f} s ({:.1f} por segundo); tempo médio "
+            "{:.1f} ms, máximo {:.1f} ms".format(
+                len(latencies),
+                elapsed,
+                len(latencies) / elapsed,
+                sum(latencies) / len(latencies) * 1e3,
+                max(latencies) * 1e3,
+            ),
+            file=log,
+        )
+
+
+if __name__ == "__main__":  # Função main
+    parser = argparse.ArgumentParser(description="Resolve um tabuleiro de Takuzu.")
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="array",
+        help="representação interna do tabuleiro (por omissão: array)",
+    )
+    parser.add_argument(
+        "--search",
+        choices=["auto"] + list(SEARCHES) + ["portfolio"],
+        default="auto",
+        help="procura a utilizar; lazy é a DFS que só gera cada filho quando o "
+        "explora, trail a que altera um único tabuleiro e desfaz as jogadas ao "
+        "retroceder, parallel a que divide a árvore por vários processos e "
+        "portfolio a que corre várias estratégias em paralelo e fica com a "
+        "primeira que terminar (por omissão: auto)",
+    )
+    parser.add_argument(
+        "--portfolio",
+        nargs="+",
+        choices=PORTFOLIO,
+        default=list(PORTFOLIO),
+        metavar="ESTRATÉGIA",
+        help="estratégias da procura portfolio: {} (por omissão, todas)".format(
+            ", ".join(PORTFOLIO)
+        ),
+    )
+    parser.add_argument(
+        "--portfolio-log",
+        metavar="FICHEIRO",
+        help="acrescentar ao FICHEIRO, por cada tabuleiro resolvido pela "
+        "procura portfolio, a dimensão, as células preenchidas, a estratégia "
+        "vencedora e o tempo em ms, separados por tabs",
+    )
+    parser.add_argument(
+        "--no-propagate",
+        dest="propagate",
+        action="store_false",
+        help="aplicar uma jogada forçada de cada vez, em vez de propagar todas",
+    )
+    parser.add_argument(
+        "--no-unique",
+        dest="unique",
+        action="store_false",
+        help="não usar a regra das filas distintas durante a propagação",
+    )
+    parser.add_argument(
+        "--rules",
+        choices=["loop", "vectorized"],
+        default="loop",
+        help="avaliar as regras célula a célula ou com operações NumPy sobre "
+        "o tabuleiro inteiro (por omissão: loop)",
+    )
+    parser.add_argument(
+        "--patterns",
+        action="store_true",
+        help="usar na propagação o índice de filas válidas, guardado em disco "
+        "(até dimensão {})".format(MAX_DIM),
+    )
+    parser.add_argument(
+        "--domains",
+        action="store_true",
+        help="resolver com domínios de filas possíveis por linha e coluna "
+        "(TakuzuDomains, até dimensão {})".format(MAX_DIM),
+    )
+    parser.add_argument(
+        "--probe",
+        type=int,
+        default=0,
+        metavar="N",
+        help="antes de ramificar, sondar até N células vazias, fixando as que "
+        "só têm um valor possível (0 desativa)",
+    )
+    parser.add_argument(
+        "--branching",
+        choices=BRANCHING,
+        default="first",
+        help="célula onde ramificar: a primeira vazia (por omissão) ou a mais "
+        "restringida",
+    )
+    parser.add_argument(
+        "--tt",
+        type=int,
+        default=0,
+        metavar="N",
+        help="nas procuras em profundidade, guardar até N estados sem solução "
+        "numa tabela de transposição (0 desativa)",
+    )
+    parser.add_argument(
+        "--tt-policy",
+        choices=("lru", "depth"),
+        default="lru",
+        help="substituição na tabela de transposição: o estado usado há mais "
+        "tempo (por omissão) ou o mais profundo",
+    )
+    parser.add_argument(
+        "--tt-shared",
+        action="store_true",
+        help="guardar a tabela de transposição em memória partilhada, para que "
+        "os processos de --search parallel vejam os estados sem solução "
+        "encontrados pelos outros (usa sempre a política depth)",
+    )
+    parser.add_argument(
+        "--snapshot",
+        type=int,
+        default=0,
+        metavar="K",
+        help="guardar o tabuleiro completo só a cada K níveis da procura, "
+        "reconstruindo os restantes a partir das jogadas (0 desativa)",
+    )
+    parser.add_argument(
+        "--pack",
+        action="store_true",
+        help="na procura Greedy, guardar os tabuleiros da fronteira e dos "
+        "estados explorados codificados em bytes",
+    )
+    parser.add_argument(
+        "--arena",
+        action="store_true",
+        help="alocar os tabuleiros numa arena reutilizada ao longo da procura "
+        "(só com --backend array e sem --snapshot)",
+    )
+    parser.add_argument(
+        "--spill",
+        type=int,
+        default=0,
+        metavar="N",
+        help="na procura Greedy, manter no máximo N nós da fronteira em memória, "
+        "escrevendo os restantes em ficheiros temporários (0 desativa)",
+    )
+    parser.add_argument(
+        "--batch",
+        nargs="?",
+        const="-",
+        metavar="PASTA",
+        help="resolver vários tabuleiros no mesmo processo: os que forem lidos "
+        "do standard input, um a seguir ao outro, ou os ficheiros .in da PASTA. "
+        "As soluções são escritas pela mesma ordem e o tempo de cada um no "
+        "standard error",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="com --batch, resolver os tabuleiros em N processos; sem --batch, "
+        "número de processos da procura parallel (por omissão, um por "
+        "processador)",
+    )
+    parser.add_argument(
+        "--chunk",
+        type=int,
+        default=8,
+        metavar="K",
+        help="com --workers, número de tabuleiros entregues de cada vez a um "
+        "processo (por omissão: 8)",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="com --batch, escrever cada solução quando termina, a seguir a uma "
+        "linha com o nome do tabuleiro, em vez de pela ordem de entrada",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=0,
+        metavar="S",
+        help="com --batch, desistir de um tabuleiro ao fim de S segundos "
+        "(0 desativa)",
+    )
+    args = parser.parse_args()
+    if args.chunk < 1:
+        parser.error("--chunk tem de ser pelo menos 1")
+
+    # Resolução do problema
+    if args.batch:
+        solve_batch(read_batch(args.batch), args)
     else:
-        goal_node = depth_first_tree_search(problem)
-    print(goal_node.state.board)
+        board = BACKENDS[args.backend].parse_instance_from_stdin()
+        goal_node = solve_args(board, args, args.workers)
+        print(goal_node.state.board)
@@ -5,9 +5,12 @@ import collections
 import collections.abc
 import functools
 import heapq
+import multiprocessing
 import operator
 import os.path
+import pickle
 import random
+import tempfile
 from itertools import chain, combinations
 from statistics import mean
 
@@ -813,6 +816,489 @@ class PriorityQueue:
             raise KeyError(str(key) + " is not in the priority queue")
         heapq.heapify(self.heap)
 
+    def decrease_key(self, item):
+        """Replace the item equal to `item` by `item` itself, with its new
+        f value. Returns the replaced item."""
+        old = next(other for _, other in self.heap if other == item)
+        del self[item]
+        self.append(item)
+        return old
+
+
+class IndexedPriorityQueue(PriorityQueue):
+    """A PriorityQueue that also keeps an index from each item to its position
+    in the heap, so that membership, lookup and decrease_key take O(1) or
+    O(log n) instead of a scan of the heap. Deleted items are only marked as
+    removed (lazy deletion) and skipped when they reach the top.
+    Items must be hashable, and the queue holds at most one item equal to a
+    given item: appending an equal item replaces it, as decrease_key does."""
+
+    def __init__(self, order="min", f=lambda x: x):
+        super().__init__(order, f)
+        self.index = {}  # item -> position in the heap of its [value, item] entry
+        self.removed = 0  # number of deleted entries still in the heap
+
+    def _less(self, i, j):
+        a, b = self.heap[i], self.heap[j]
+        if a[0] != b[0]:
+            return a[0] < b[0]
+        return a[1] is None or (b[1] is not None and a[1] < b[1])
+
+    def _swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        for k in (i, j):
+            if heap[k][1] is not None:
+                self.index[heap[k][1]] = k
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if not self._less(i, parent):
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        n = len(self.heap)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and self._less(child + 1, child):
+                child += 1
+            if not self._less(child, i):
+                break
+            self._swap(i, child)
+            i = child
+
+    def append(self, item):
+        """Insert item at its correct position."""
+        if item in self.index:
+            self.decrease_key(item)
+            return
+        self.heap.append([self.f(item), item])
+        self.index[item] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def pop(self):
+        """Pop and return the item (with min or max f(x) value)
+        depending on the order."""
+        while self.heap:
+            self._swap(0, len(self.heap) - 1)
+            value, item = self.heap.pop()
+            if self.heap:
+                self._sift_down(0)
+            if item is None:
+                self.removed -= 1
+                continue
+            del self.index[item]
+            return item
+        raise Exception("Trying to pop from empty PriorityQueue.")
+
+    def __len__(self):
+        """Return current capacity of PriorityQueue."""
+        return len(self.index)
+
+    def __contains__(self, key):
+        """Return True if the key is in PriorityQueue."""
+        return key in self.index
+
+    def __getitem__(self, key):
+        """Returns the value associated with key in PriorityQueue.
+        Raises KeyError if key is not present."""
+        if key not in self.index:
+            raise KeyError(str(key) + " is not in the priority queue")
+        return self.heap[self.index[key]][0]
+
+    def __delitem__(self, key):
+        """Delete key. Its entry stays in the heap, with no item, until it is
+        popped; deleted entries sort before any live entry of the same value."""
+        if key not in self.index:
+            raise KeyError(str(key) + " is not in the priority queue")
+        i = self.index.pop(key)
+        self.heap[i][1] = None
+        self.removed += 1
+        self._sift_up(i)
+
+    def decrease_key(self, item):
+        """Replace the item equal to `item` by `item` itself, with its new
+        f value, moving it up (or down) the heap in place. Returns the
+        replaced item."""
+        i = self.index.pop(item)
+        value, old = self.heap[i]
+        self.heap[i] = [self.f(item), item]
+        self.index[item] = i
+        if self.heap[i][0] < value:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+        return old
+
+
+class SpillingPriorityQueue(IndexedPriorityQueue):
+    """An IndexedPriorityQueue that keeps at most `capacity` items in memory.
+    When it grows past that, the worse half of the in-memory entries is
+    pickled, in order, to a run file in a temporary directory (`directory`,
+    or the system default). Runs are merged back lazily: only the head entry
+    of each run is held in memory, and pop returns the smallest of the heap
+    top and the run heads. Objects of a type in `shared` found inside a
+    spilled item (e.g. the parent Node of a search node) are not written out
+    but referenced, and kept in memory until every spilled entry that refers
+    to them is read back.
+    Spilled items are remembered by hash only; membership and lookup of an
+    item whose hash matches a spilled one scan the runs, and deleting it only
+    marks its entry to be skipped when it is read back.
+    Counts the runs written and the entries spilled."""
+
+    def __init__(
+        self, order="min", f=lambda x: x, capacity=2**16, directory=None, shared=()
+    ):
+        super().__init__(order, f)
+        if capacity < 2:
+            raise ValueError("Capacity must be at least 2.")
+        self.capacity = capacity
+        self.directory = directory
+        self.shared = tuple(shared)
+        self.runs = []  # open run files (None once read to the end)
+        self.heads = []  # heap of [value, item, run, seq] with each run's head
+        self.on_disk = collections.Counter()  # hash(item) -> entries in runs
+        self.dropped = set()  # seq of the deleted entries still in runs
+        self.pinned = {}  # id(obj) -> [obj, references in spilled entries]
+        self.seq = 0  # number of the next spilled entry
+        self.spills = self.spilled = 0
+        self._item = None  # item being written
+        self._consume = True  # whether reading releases the pinned objects
+
+    def _persistent_id(self, obj):
+        if obj is not self._item and isinstance(obj, self.shared):
+            pin = self.pinned.setdefault(id(obj), [obj, 0])
+            pin[1] += 1
+            return id(obj)
+        return None
+
+    def _persistent_load(self, pid):
+        pin = self.pinned[pid]
+        if self._consume:
+            pin[1] -= 1
+            if not pin[1]:
+                del self.pinned[pid]
+        return pin[0]
+
+    def _write(self, file, value, item):
+        self._item = item
+        pickler = pickle.Pickler(file, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = self._persistent_id
+        pickler.dump((value, item, self.seq))
+        self._item = None
+        self.on_disk[hash(item)] += 1
+        self.seq += 1
+
+    def _read(self, file, consume=True):
+        """Read the next (value, item, seq) entry of a run, or None at its end."""
+        self._consume = consume
+        unpickler = pickle.Unpickler(file)
+        unpickler.persistent_load = self._persistent_load
+        try:
+            return unpickler.load()
+        except EOFError:
+            return None
+
+    def _next_head(self, run):
+        """Push the next live entry of a run to the heads, or close the run."""
+        file = self.runs[run]
+        while True:
+            entry = self._read(file)
+            if entry is None:
+                file.close()
+                self.runs[run] = None
+                return
+            value, item, seq = entry
+            h = hash(item)
+            self.on_disk[h] -= 1
+            if not self.on_disk[h]:
+                del self.on_disk[h]
+            if seq in self.dropped:
+                self.dropped.remove(seq)
+                continue
+            heapq.heappush(self.heads, [value, item, run, seq])
+            return
+
+    def _spill(self):
+        """Write the worse half of the in-memory entries to a new run."""
+        live = sorted(entry for entry in self.heap if entry[1] is not None)
+        keep = self.capacity // 2
+        # A sorted list is a valid heap
+        self.heap, out = live[:keep], live[keep:]
+        self.index = {item: i for i, (value, item) in enumerate(self.heap)}
+        self.removed = 0
+        file = tempfile.TemporaryFile(dir=self.directory)
+        for value, item in out:
+            self._write(file, value, item)
+        file.seek(0)
+        self.runs.append(file)
+        self.spills += 1
+        self.spilled += len(out)
+        self._next_head(len(self.runs) - 1)
+
+    def _find(self, key):
+        """Return the [value, item, run, seq] head or (value, item, seq) run
+        entry of the live spilled item equal to key, or None."""
+        for head in self.heads:
+            if head[1] == key:
+                return head
+        if hash(key) not in self.on_disk:
+            return None
+        for file in self.runs:
+            if file is None:
+                continue
+            position = file.tell()
+            entry = self._read(file, consume=False)
+            while entry is not None:
+                if entry[1] == key and entry[2] not in self.dropped:
+                    break
+                entry = self._read(file, consume=False)
+            file.seek(position)
+            if entry is not None:
+                return entry
+        return None
+
+    def _drop(self, entry):
+        """Delete a spilled entry found by _find."""
+        if len(entry) == 3:
+            self.dropped.add(entry[2])
+            return
+        # Replace the head by the next entry of its run
+        self.heads.remove(entry)
+        heapq.heapify(self.heads)
+        self._next_head(entry[2])
+
+    def append(self, item):
+        """Insert item at its correct position."""
+        if item not in self.index:
+            entry = self._find(item)
+            if entry is not None:
+                self._drop(entry)
+        super().append(item)
+        if len(self.index) > self.capacity:
+            self._spill()
+
+    def pop(self):
+        """Pop and return the item (with min or max f(x) value)
+        depending on the order."""
+        # Discard deleted entries at the top, so that it holds the live minimum
+        while self.heap and self.heap[0][1] is None:
+            self._swap(0, len(self.heap) - 1)
+            self.heap.pop()
+            self.removed -= 1
+            if self.heap:
+                self._sift_down(0)
+        if self.heads and (not self.heap or self.heads[0][:2] < self.heap[0]):
+            value, item, run, seq = heapq.heappop(self.heads)
+            self._next_head(run)
+            return item
+        return super().pop()
+
+    def __len__(self):
+        """Return current capacity of PriorityQueue."""
+        on_disk = sum(self.on_disk.values()) - len(self.dropped)
+        return len(self.index) + len(self.heads) + on_disk
+
+    def __contains__(self, key):
+        """Return True if the key is in PriorityQueue."""
+        return key in self.index or self._find(key) is not None
+
+    def __getitem__(self, key):
+        """Returns the value associated with key in PriorityQueue.
+        Raises KeyError if key is not present."""
+        if key in self.index:
+            return self.heap[self.index[key]][0]
+        entry = self._find(key)
+        if entry is None:
+            raise KeyError(str(key) + " is not in the priority queue")
+        return entry[0]
+
+    def __delitem__(self, key):
+        """Delete key."""
+        if key in self.index:
+            super().__delitem__(key)
+            return
+        entry = self._find(key)
+        if entry is None:
+            raise KeyError(str(key) + " is not in the priority queue")
+        self._drop(entry)
+
+    def decrease_key(self, item):
+        """Replace the item equal to `item` by `item` itself, with its new
+        f value. Returns the replaced item, or None if it was on disk."""
+        if item in self.index:
+            return super().decrease_key(item)
+        self.append(item)
+        return None
+
+    def close(self):
+        """Close (and so delete) the run files."""
+        for file in self.runs:
+            if file is not None:
+                file.close()
+        self.runs = []
+        self.heads = []
+
+
+class TranspositionTable:
+    """A bounded set of state keys (e.g. hash(state)) with the depth at which
+    each was stored, used to remember states known to lead to no solution.
+    It never holds more than `size` entries. With policy 'lru' the least
+    recently used entry is evicted when it is full; with policy 'depth' each
+    key maps to one of `size` slots and a stored entry is only replaced by
+    one at the same depth or shallower (whose subtree is larger).
+    Counts hits, misses, stores and evictions."""
+
+    def __init__(self, size=2**16, policy="lru"):
+        if policy not in ("lru", "depth"):
+            raise ValueError("Policy must be either 'lru' or 'depth'.")
+        self.size = size
+        self.policy = policy
+        if policy == "lru":
+            self.entries = collections.OrderedDict()
+        else:
+            self.slots = [None] * size
+        self.hits = self.misses = self.stores = self.evictions = 0
+
+    def __contains__(self, key):
+        if self.policy == "lru":
+            found = key in self.entries
+            if found:
+                self.entries.move_to_end(key)
+        else:
+            slot = self.slots[key % self.size]
+            found = slot is not None and slot[0] == key
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    def add(self, key, depth=0):
+        """Store key, found at the given search depth."""
+        if self.policy == "lru":
+            if key not in self.entries and len(self.entries) >= self.size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            self.entries[key] = depth
+            self.entries.move_to_end(key)
+        else:
+            i = key % self.size
+            slot = self.slots[i]
+            if slot is not None and slot[0] != key:
+                if slot[1] < depth:
+                    return
+                self.evictions += 1
+            self.slots[i] = (key, depth)
+        self.stores += 1
+
+    def __len__(self):
+        if self.policy == "lru":
+            return len(self.entries)
+        return sum(slot is not None for slot in self.slots)
+
+
+class SharedTranspositionTable:
+    """A TranspositionTable with policy 'depth' whose slots live in shared
+    memory, so that the processes forked after it is created (e.g. by
+    depth_first_parallel_search) all see the states stored by the others.
+    Lookups read the slots without locking; a store takes one of `stripes`
+    locks, chosen by slot. Each process counts hits, misses, stores and
+    evictions in its own row of a shared array, selected with attach(), and
+    also counts shared hits: hits on states stored by another process. The
+    counters read from the table are the sums over all processes. Keys are
+    kept as unsigned 64-bit integers, so any int key is reduced modulo 2**64.
+    >>> table = SharedTranspositionTable(16)
+    >>> table.add(2**64 - 5, 3)
+    >>> 2**64 - 5 in table, -5 in table, 11 in table
+    (True, True, False)
+    """
+
+    policy = "depth"
+    # Counters kept by each process, in this order, in its row of `counts`
+    counters = ("hits", "misses", "stores", "evictions", "shared_hits")
+    mask = 2**64 - 1
+
+    def __init__(self, size=2**16, stripes=64, processes=1):
+        self.size = size
+        self.keys = multiprocessing.RawArray("Q", size)
+        # Depth of the entry in each slot, or -1 if it is empty
+        self.depths = multiprocessing.RawArray("i", [-1] * size)
+        self.owners = multiprocessing.RawArray("i", size)
+        self.locks = [multiprocessing.Lock() for _ in range(stripes)]
+        self.processes = 0
+        self.counts = multiprocessing.RawArray("q", 0)
+        self.reserve(processes)
+        self.owner = 0
+
+    def reserve(self, processes):
+        """Make room for the counters of `processes` processes (rows 0 to
+        processes - 1). Must be called before the processes are forked."""
+        if processes > self.processes:
+            counts = multiprocessing.RawArray("q", processes * len(self.counters))
+            counts[: len(self.counts)] = self.counts[:]
+            self.counts = counts
+            self.processes = processes
+
+    def attach(self, owner):
+        """Make the calling process count in row `owner` (0 by default)."""
+        if not 0 <= owner < self.processes:
+            raise ValueError(
+                "Owner must be between 0 and {}.".format(self.processes - 1)
+            )
+        self.owner = owner
+
+    def _count(self, counter):
+        k = self.counters.index(counter)
+        self.counts[self.owner * len(self.counters) + k] += 1
+
+    def total(self, counter):
+        """Sum of a counter over all processes."""
+        k = self.counters.index(counter)
+        return sum(self.counts[k :: len(self.counters)])
+
+    hits = property(lambda self: self.total("hits"))
+    misses = property(lambda self: self.total("misses"))
+    stores = property(lambda self: self.total("stores"))
+    evictions = property(lambda self: self.total("evictions"))
+    shared_hits = property(lambda self: self.total("shared_hits"))
+
+    def __contains__(self, key):
+        key &= self.mask
+        i = key % self.size
+        # A slot being replaced may show the new key with the old depth, but
+        # any key found in it was stored as a dead state
+        found = self.depths[i] >= 0 and self.keys[i] == key
+        if found:
+            self._count("hits")
+            if self.owners[i] != self.owner:
+                self._count("shared_hits")
+        else:
+            self._count("misses")
+        return found
+
+    def add(self, key, depth=0):
+        """Store key, found at the given search depth."""
+        key &= self.mask
+        i = key % self.size
+        with self.locks[i % len(self.locks)]:
+            if self.depths[i] >= 0 and self.keys[i] != key:
+                if self.depths[i] < depth:
+                    return
+                self._count("evictions")
+            self.keys[i] = key
+            self.owners[i] = self.owner
+            self.depths[i] = depth
+        self._count("stores")
+
+    def __len__(self):
+        return sum(depth >= 0 for depth in self.depths)
+
 
 # ______________________________________________________________________________
 # Useful Shorthands